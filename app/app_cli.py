@@ -4,15 +4,41 @@
 # Configuração: criar um arquivo .env com GEMINI_API_KEY (ver .env.example)
 
 from py.config import GEMINI_API_KEY
-from chatbot import init_gemini, build_pitch, summarize_for_sales
+from chatbot import init_gemini, generate_stream, stream_pitch, summarize_for_sales
+from prompt_cache import default_prompt_cache
 from rag_store import VectorStore
+from typing import Iterable
 import json
 
+# Similaridade (cosseno) a partir da qual a resposta do FAQ é exibida sem reescrita
+DIRECT_ANSWER_SCORE = 0.85
+
+
+def print_stream(chunks: Iterable[str]) -> str:
+    """
+    Imprime os pedaços à medida que chegam e devolve o texto completo.
+    """
+    parts = []
+    for chunk in chunks:
+        print(chunk, end="", flush=True)
+        parts.append(chunk)
+    print()
+    return "".join(parts).strip()
+
 
 def main():
     # Inicializa o modelo Gemini e o vetor semântico
     model = init_gemini(GEMINI_API_KEY, "gemini-1.5-flash")
-    store = VectorStore(GEMINI_API_KEY)
+    cache = default_prompt_cache()  # memória + SQLite (base/prompt_cache.db)
+    # Só as perguntas são indexadas: o score compara pergunta do lead x pergunta do FAQ
+    store = VectorStore(
+        GEMINI_API_KEY,
+        metric="cosine",
+        dedupe_answers=True,
+        direct_threshold=DIRECT_ANSWER_SCORE,
+    )
+    # O encoder carrega em segundo plano enquanto o usuário digita os dados do lead
+    store.encoder.warmup()
     store.load_faq_from_json("data/faq.json")
 
     print("=== Chatbot Welhome (CLI) ===")
@@ -26,9 +52,13 @@ def main():
         "experiencia": input("Já usou outras plataformas? ").strip(),
     }
 
-    # Geração do pitch e resumo estruturado
-    pitch = build_pitch(model, lead)
-    resumo = summarize_for_sales(model, lead, pitch)
+    # Geração do pitch (exibido em streaming) e resumo estruturado
+    print("\n--- Pitch Personalizado ---\n")
+    pitch = print_stream(stream_pitch(model, lead, cache=cache))
+
+    resumo = summarize_for_sales(model, lead, pitch, cache=cache)
+    print("\n--- Resumo Estruturado (para vendedor) ---\n")
+    print(resumo.get("resumo_texto"))
 
     resumo_texto = f"""Resumo do lead {lead_id}
 {json.dumps(lead, ensure_ascii=False)}
@@ -42,27 +72,28 @@ Resumo estruturado:
     # Armazenamento no histórico vetorial
     store.add_history(lead_id, resumo_texto)
 
-    print("\n--- Pitch Personalizado ---\n")
-    print(pitch)
-    print("\n--- Resumo Estruturado (para vendedor) ---\n")
-    print(resumo.get("resumo_texto"))
-
     # Recuperação aumentada (RAG) no FAQ
     print("\n=== RAG – Pergunte algo do FAQ (ENTER para pular) ===")
     q = input("Pergunta: ").strip()
     if q:
         hit = store.rag_answer(q, top_k=2)
 
-        natural_prompt = f"""
-        Você é o assistente da Welhome.
-        Pergunta do lead: {q}
-        Resposta do FAQ: {hit['answer']}
-        Reescreva de forma clara, objetiva e amigável (2-4 linhas).
-        """
-        natural_resp = model.generate_content(natural_prompt).text.strip()
-
-        print("\n[RAG] Pergunta FAQ mais próxima:", hit["question"])
-        print("[RAG] Resposta naturalizada:", natural_resp)
+        if hit["question"] is None:
+            print("\n[RAG] Nenhuma pergunta do FAQ encontrada.")
+        elif hit["direct"]:
+            # Pergunta praticamente idêntica: a resposta do FAQ dispensa o Gemini
+            print(f"\n[RAG] Pergunta FAQ mais próxima: {hit['question']} (score {hit['score']:.2f})")
+            print("[RAG] Resposta do FAQ:", hit["answer"])
+        else:
+            natural_prompt = f"""
+            Você é o assistente da Welhome.
+            Pergunta do lead: {q}
+            Resposta do FAQ: {hit['answer']}
+            Reescreva de forma clara, objetiva e amigável (2-4 linhas).
+            """
+            print(f"\n[RAG] Pergunta FAQ mais próxima: {hit['question']} (score {hit['score']:.2f})")
+            print("[RAG] Resposta naturalizada: ", end="")
+            print_stream(generate_stream(model, natural_prompt, cache=cache))
 
     # Busca semântica no histórico de leads
     print("\n=== Busca no histórico (ENTER para pular) ===")
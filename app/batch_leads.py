@@ -0,0 +1,377 @@
+# batch_leads.py
+# Processamento em lote de leads (pitch + resumo para vendas) com o Gemini.
+# Entrada: CSV, JSONL ou a tabela `leads` de um SQLite (ex.: models/leads.db).
+# Saída: JSONL ou SQLite, gravados em lotes; a própria saída serve de checkpoint,
+# então rodar de novo retoma do ponto em que parou.
+#
+# Uso:
+#   PYTHONPATH=src:py:. python app/batch_leads.py leads.csv output/leads_processados.jsonl --concurrency 16 --rps 5
+
+import os
+import csv
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+from typing import Dict, Iterator, List, Set
+
+from chatbot import init_gemini, abuild_pitch, abuild_pitch_and_summary, asummarize_for_sales
+from prompt_cache import default_prompt_cache
+
+# Colunas da tabela `leads` -> chaves esperadas pelo chatbot
+LEAD_FIELDS = {
+    "nome": "nome",
+    "qtd_imoveis": "qtd_imoveis",
+    "qtde_imoveis": "qtd_imoveis",
+    "localizacao": "localizacao",
+    "experiencia": "experiencia",
+}
+
+
+# ============================
+# Leitura / escrita
+# ============================
+def _normalize_lead(row: Dict, position: int) -> Dict:
+    lead = {LEAD_FIELDS[k]: (v or "") for k, v in row.items() if k in LEAD_FIELDS}
+    lead["lead_id"] = str(row.get("lead_id") or f"lead_{position:06d}")
+    return lead
+
+
+def read_leads(path: str) -> Iterator[Dict]:
+    """
+    Lê leads de .csv, .jsonl ou .db (tabela `leads`), um por vez.
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for pos, row in enumerate(csv.DictReader(f), 1):
+                yield _normalize_lead(row, pos)
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for pos, line in enumerate(f, 1):
+                if line.strip():
+                    yield _normalize_lead(json.loads(line), pos)
+    elif ext == ".db":
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            for pos, row in enumerate(conn.execute("SELECT * FROM leads ORDER BY id"), 1):
+                yield _normalize_lead(dict(row), pos)
+        finally:
+            conn.close()
+    else:
+        raise ValueError(f"Formato de entrada não suportado: {path}")
+
+
+class ResultWriter:
+    """
+    Acumula resultados e grava em lote (JSONL em modo append ou SQLite).
+    Os lead_id já gravados formam o checkpoint para retomar o processamento.
+    """
+
+    def __init__(self, path: str, flush_every: int = 50) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self.is_db = path.lower().endswith(".db")
+        self._buffer: List[Dict] = []
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.is_db:
+            self._conn = sqlite3.connect(path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lead_results (
+                    lead_id TEXT PRIMARY KEY,
+                    lead TEXT,
+                    pitch TEXT,
+                    resumo TEXT
+                )
+                """
+            )
+            self._conn.commit()
+
+    def done_ids(self) -> Set[str]:
+        if self.is_db:
+            return {r[0] for r in self._conn.execute("SELECT lead_id FROM lead_results")}
+        if not os.path.exists(self.path):
+            return set()
+
+        with open(self.path, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+
+        done: Set[str] = set()
+        offset = 0
+        for n, line in enumerate(lines, 1):
+            try:
+                if line.strip():
+                    done.add(json.loads(line)["lead_id"])
+            except (ValueError, KeyError, TypeError):
+                if n == len(lines):
+                    # Queda no meio da escrita: corta a linha incompleta para o
+                    # próximo append não colar nela (o lead é processado de novo)
+                    print(f"Aviso: última linha incompleta em {self.path} descartada.")
+                    with open(self.path, "r+b") as f:
+                        f.truncate(offset)
+                    return done
+                print(f"Aviso: linha {n} inválida em {self.path} ignorada.")
+            offset += len(line)
+
+        if lines and not lines[-1].endswith(b"\n"):
+            # Registro completo, mas a quebra de linha não chegou ao disco
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+        return done
+
+    def add(self, result: Dict) -> None:
+        self._buffer.append(result)
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+
+        if self.is_db:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO lead_results (lead_id, lead, pitch, resumo) VALUES (?, ?, ?, ?)",
+                [
+                    (r["lead_id"], json.dumps(r["lead"], ensure_ascii=False), r["pitch"], r["resumo"])
+                    for r in self._buffer
+                ],
+            )
+            self._conn.commit()
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in self._buffer))
+                f.flush()
+                os.fsync(f.fileno())
+        self._buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self.is_db:
+            self._conn.close()
+
+
+# ============================
+# Controle de vazão
+# ============================
+class RateLimiter:
+    """
+    Token bucket: no máximo `rate` chamadas por segundo (rajadas de até `burst`).
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._updated = time.monotonic()
+                self._tokens = 1
+            self._tokens -= 1
+
+
+class StageStats:
+    """
+    Contadores por etapa (chamadas, falhas, novas tentativas, tempo acumulado).
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def record(self, stage: str, seconds: float, ok: bool, retries: int) -> None:
+        s = self.stages.setdefault(stage, {"ok": 0, "failed": 0, "retries": 0, "busy_s": 0.0})
+        s["ok" if ok else "failed"] += 1
+        s["retries"] += retries
+        s["busy_s"] += seconds
+
+    def report(self, wall_s: float) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for stage, s in self.stages.items():
+            calls = s["ok"] + s["failed"]
+            out[stage] = {
+                **s,
+                "busy_s": round(s["busy_s"], 2),
+                "avg_latency_s": round(s["busy_s"] / calls, 3) if calls else 0.0,
+                "throughput_per_s": round(s["ok"] / wall_s, 2) if wall_s else 0.0,
+            }
+        return out
+
+
+# ============================
+# Pipeline
+# ============================
+async def _call_with_retries(stage, coro_factory, limiter, stats, retries, base_delay):
+    attempt = 0
+    start = time.perf_counter()
+    while True:
+        await limiter.acquire()
+        try:
+            result = await coro_factory()
+            stats.record(stage, time.perf_counter() - start, True, attempt)
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if attempt >= retries:
+                stats.record(stage, time.perf_counter() - start, False, attempt)
+                raise
+            # Backoff exponencial com jitter (erros 429/5xx da API costumam ser transitórios)
+            await asyncio.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+            attempt += 1
+
+
+async def process_leads(
+    leads: Iterator[Dict],
+    writer: ResultWriter,
+    model,
+    concurrency: int = 8,
+    rps: float = 5.0,
+    retries: int = 3,
+    base_delay: float = 1.0,
+    timeout: float = 60.0,
+    cache=None,
+    combined: bool = True,
+) -> Dict:
+    """
+    Processa os leads com um pool de `concurrency` workers e grava em lote.
+    Leads já presentes na saída são pulados (retomada após falha).
+
+    Com `combined=True` pitch e resumo saem de uma única chamada (JSON);
+    caso contrário, duas chamadas sequenciais por lead. Se o JSON combinado vier
+    inválido, as duas chamadas extras contam nas etapas "pitch_fallback" e
+    "summary_fallback" e também respeitam o limite de `rps`.
+    """
+    done = writer.done_ids()
+    limiter = RateLimiter(rps, burst=concurrency)
+    stats = StageStats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    counters = {"processed": 0, "skipped": 0, "failed": 0}
+
+    async def worker() -> None:
+        while True:
+            lead = await queue.get()
+            if lead is None:
+                queue.task_done()
+                return
+            lead_id = lead.pop("lead_id")
+            try:
+                parsed = None
+                if combined:
+                    # Sem o fallback interno: cada chamada passa pelo limiter e tem sua etapa
+                    parsed = await _call_with_retries(
+                        "pitch_summary",
+                        lambda: abuild_pitch_and_summary(
+                            model, lead, cache=cache, timeout=timeout, fallback=False
+                        ),
+                        limiter, stats, retries, base_delay,
+                    )
+                if parsed is not None:
+                    pitch, resumo = parsed
+                else:
+                    # Duas chamadas (--two-calls ou JSON combinado inválido)
+                    suffix = "_fallback" if combined else ""
+                    pitch = await _call_with_retries(
+                        "pitch" + suffix,
+                        lambda: abuild_pitch(model, lead, cache=cache, timeout=timeout),
+                        limiter, stats, retries, base_delay,
+                    )
+                    resumo = await _call_with_retries(
+                        "summary" + suffix,
+                        lambda: asummarize_for_sales(model, lead, pitch, cache=cache, timeout=timeout),
+                        limiter, stats, retries, base_delay,
+                    )
+                writer.add({
+                    "lead_id": lead_id,
+                    "lead": lead,
+                    "pitch": pitch,
+                    "resumo": resumo["resumo_texto"],
+                })
+                counters["processed"] += 1
+            except Exception as e:
+                counters["failed"] += 1
+                print(f"Falha no lead {lead_id}: {e}")
+            finally:
+                queue.task_done()
+
+    start = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        for lead in leads:
+            if lead["lead_id"] in done:
+                counters["skipped"] += 1
+                continue
+            await queue.put(lead)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for w in workers:
+            w.cancel()
+        writer.flush()
+
+    wall_s = time.perf_counter() - start
+    return {
+        **counters,
+        "wall_s": round(wall_s, 2),
+        "leads_per_s": round(counters["processed"] / wall_s, 2) if wall_s else 0.0,
+        "stages": stats.report(wall_s),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pitch + resumo de leads em lote")
+    parser.add_argument("input", help="Arquivo .csv, .jsonl ou .db (tabela leads)")
+    parser.add_argument("output", help="Saída .jsonl ou .db (também é o checkpoint)")
+    parser.add_argument("--model", default="gemini-1.5-flash")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=5.0, help="Chamadas por segundo (0 = sem limite)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--flush-every", type=int, default=50)
+    parser.add_argument("--two-calls", action="store_true",
+                        help="Pitch e resumo em chamadas separadas (padrão: uma chamada em JSON)")
+    args = parser.parse_args()
+
+    # Config só aqui: importar o módulo (ex.: nos testes) não exige a chave
+    from py.config import GEMINI_API_KEY
+
+    model = init_gemini(GEMINI_API_KEY, args.model)
+    writer = ResultWriter(args.output, flush_every=args.flush_every)
+    try:
+        report = asyncio.run(
+            process_leads(
+                read_leads(args.input),
+                writer,
+                model,
+                concurrency=args.concurrency,
+                rps=args.rps,
+                retries=args.retries,
+                timeout=args.timeout,
+                cache=default_prompt_cache(),
+                combined=not args.two_calls,
+            )
+        )
+    finally:
+        writer.close()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# load_test.py
+# Teste de carga do caminho de uma pergunta no app (sem Streamlit):
+# encode -> busca -> cache semântico -> prompt -> LLM -> histórico (src/rag_pipeline.py).
+# Aumenta a concorrência em degraus, mede vazão e latência por etapa e aponta
+# o ponto de saturação. Por padrão usa o LLM simulado (LLM_BACKEND=fake).
+#
+# Uso:
+#   python app/load_test.py --concurrency 1 2 4 8 16 32 --requests 200 \
+#       --output-json output/load_test.json --output-csv output/load_test.csv
+
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import METRICS
+from rag_pipeline import CONTEXT_PASSAGES, DIRECT_ANSWER_SCORE, RAGPipeline, build_pipeline
+
+STAGES = ("encode", "search", "cache", "prompt", "ttft", "generate", "history", "total")
+
+
+# ============================
+# Carga
+# ============================
+def load_mix(specs: Sequence[str]) -> Tuple[List[List[str]], List[float]]:
+    """
+    Lê "arquivo.json:peso" -> (perguntas de cada arquivo, pesos).
+    """
+    pools, weights = [], []
+    for spec in specs:
+        path, _, weight = spec.partition(":")
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        pools.append([item.get("pergunta", item.get("q")) for item in items])
+        weights.append(float(weight or 1.0))
+    return pools, weights
+
+
+def sample_queries(pools: List[List[str]], weights: List[float], n: int, seed: int) -> List[str]:
+    """
+    `n` perguntas sorteadas (reprodutível): primeiro o arquivo pelo peso, depois a pergunta.
+    """
+    rng = random.Random(seed)
+    chosen = rng.choices(range(len(pools)), weights=weights, k=n)
+    return [rng.choice(pools[i]) for i in chosen]
+
+
+def make_pipeline(args: argparse.Namespace) -> RAGPipeline:
+    """
+    Mesmo `build_pipeline` do app Streamlit (cross-encoder e cache semântico ligados
+    por padrão), com histórico e cache semântico isolados dos arquivos do app.
+    """
+    pipeline = build_pipeline(
+        os.getenv("GEMINI_API_KEY"),
+        args.faq,
+        search_mode=args.search_mode,
+        direct_threshold=args.direct_threshold,
+        context_passages=args.context_passages,
+        rerank=not args.no_rerank,
+        semantic_cache=not args.no_semantic_cache,
+        semantic_cache_path=None,
+        history_db=args.history_db,
+        history_index=None,
+        llm_backend=args.backend,
+    )
+    if pipeline.store.index is None:
+        raise SystemExit(f"FAQ não encontrado: {args.faq}")
+    return pipeline
+
+
+# ============================
+# Execução
+# ============================
+def run_level(pipeline: RAGPipeline, queries: List[str], concurrency: int) -> Dict:
+    """
+    Dispara `queries` com `concurrency` threads (cada uma é uma "sessão").
+    """
+    local = threading.local()
+    results: List[Dict] = []
+    lock = threading.Lock()
+
+    def one(query: str) -> None:
+        if not hasattr(local, "session_id"):
+            local.session_id = f"load-{threading.get_ident()}"
+        try:
+            result = pipeline.answer(query, session_id=local.session_id)
+        except Exception as e:
+            result = {"source": "exception", "error": str(e), "timings": {}}
+        with lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, queries))
+    wall_s = time.perf_counter() - start
+
+    sources: Dict[str, int] = {}
+    for r in results:
+        sources[r["source"]] = sources.get(r["source"], 0) + 1
+    failed = sources.get("error", 0) + sources.get("exception", 0)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": failed,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round((len(results) - failed) / wall_s, 2) if wall_s else 0.0,
+        "sources": sources,
+        "stages": {
+            stage: _percentiles([r["timings"][stage] for r in results if stage in r["timings"]])
+            for stage in STAGES
+        },
+    }
+
+
+def _percentiles(samples_s: List[float]) -> Dict[str, float]:
+    if not samples_s:
+        return {"count": 0}
+    ms = np.asarray(samples_s) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def saturation_point(levels: List[Dict], min_gain: float = 0.1) -> Optional[Dict]:
+    """
+    Último nível em que dobrar a concorrência ainda rendia pelo menos `min_gain`
+    de vazão; a partir dele o processo está saturado. None se não saturou.
+    """
+    best = None
+    for level in levels:
+        if best is not None and level["throughput_rps"] < best["throughput_rps"] * (1 + min_gain):
+            return {
+                "concurrency": best["concurrency"],
+                "throughput_rps": best["throughput_rps"],
+                "p95_total_ms": best["stages"]["total"].get("p95_ms"),
+            }
+        if best is None or level["throughput_rps"] > best["throughput_rps"]:
+            best = level
+    return None
+
+
+def write_csv(path: str, levels: List[Dict]) -> None:
+    """
+    Uma linha por (concorrência, etapa), com a vazão do nível repetida em cada linha.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fields = ["concurrency", "throughput_rps", "errors", "stage",
+              "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for level in levels:
+            for stage, stats in level["stages"].items():
+                writer.writerow({
+                    "concurrency": level["concurrency"],
+                    "throughput_rps": level["throughput_rps"],
+                    "errors": level["errors"],
+                    "stage": stage,
+                    **stats,
+                })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do caminho RAG (sem Streamlit)")
+    parser.add_argument("--faq", default=os.path.join("data", "faq.json"), help="FAQ indexado")
+    parser.add_argument("--mix", nargs="+",
+                        default=[os.path.join("data", "faq.json") + ":0.3",
+                                 os.path.join("data", "faq_expandido.json") + ":0.7"],
+                        help="Origem das perguntas: arquivo.json:peso")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Perguntas por nível de concorrência")
+    parser.add_argument("--backend", default=os.getenv("LLM_BACKEND", "fake"),
+                        help="Backend do LLM (padrão: fake, sem rede)")
+    parser.add_argument("--search-mode", default="hybrid")
+    parser.add_argument("--direct-threshold", type=float, default=DIRECT_ANSWER_SCORE)
+    parser.add_argument("--context-passages", type=int, default=CONTEXT_PASSAGES)
+    parser.add_argument("--no-semantic-cache", action="store_true",
+                        help="Desliga o cache semântico (ligado no app)")
+    parser.add_argument("--no-rerank", action="store_true", help="Desliga o cross-encoder (ligado no app)")
+    parser.add_argument("--history-db", default=None, help="SQLite do histórico (padrão: em memória)")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="Ganho mínimo de vazão entre níveis para não considerar saturado")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-json")
+    parser.add_argument("--output-csv")
+    parser.add_argument("--output-metrics", help="Métricas acumuladas no formato texto do Prometheus")
+    args = parser.parse_args()
+
+    pipeline = make_pipeline(args)
+    pools, weights = load_mix(args.mix)
+
+    # Aquecimento: carrega o encoder e estabiliza caches antes de medir
+    for q in sample_queries(pools, weights, 5, args.seed):
+        pipeline.answer(q, session_id="warmup")
+
+    levels = []
+    for i, concurrency in enumerate(args.concurrency):
+        queries = sample_queries(pools, weights, args.requests, args.seed + i)
+        level = run_level(pipeline, queries, concurrency)
+        levels.append(level)
+        print(f"c={concurrency:>3}  {level['throughput_rps']:>8} req/s  "
+              f"p95={level['stages']['total'].get('p95_ms')} ms  erros={level['errors']}")
+
+    report = {
+        "config": vars(args),
+        "levels": levels,
+        "saturation": saturation_point(levels, args.min_gain),
+    }
+    if hasattr(pipeline.store.llm.gemini, "stats"):
+        report["llm_backend_stats"] = pipeline.store.llm.gemini.stats()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output_json:
+        os.makedirs(os.path.dirname(args.output_json) or ".", exist_ok=True)
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.output_csv:
+        write_csv(args.output_csv, levels)
+    if args.output_metrics:
+        METRICS.write_prometheus(args.output_metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# startup_profile.py
+# Perfil de inicialização do app Streamlit e do CLI, sempre em um processo novo:
+# - tempo de import de cada módulo (python -X importtime) e quais bibliotecas pesadas
+#   (torch, sentence_transformers, faiss, google.generativeai...) são carregadas já no import;
+# - tempo até o índice do FAQ estar pronto e até o encoder terminar de carregar.
+# Rodar antes e depois de uma mudança (ex.: git stash) mostra o ganho no cold start.
+#
+# Uso:
+#   python app/startup_profile.py --entry streamlit --top 15 --output output/startup.json
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos importados por cada ponto de entrada (na ordem dos próprios scripts)
+ENTRIES = {
+    "streamlit": ["streamlit", "metrics", "rag_pipeline", "rag_store", "reranker", "semantic_cache", "config"],
+    "cli": ["py.config", "chatbot", "prompt_cache", "rag_store"],
+}
+
+HEAVY = ("torch", "sentence_transformers", "transformers", "faiss", "google.generativeai", "huggingface_hub")
+
+# Executado no processo filho: import -> VectorStore -> FAQ pronto -> encoder carregado
+_READY_SCRIPT = """
+import os, sys, json, time
+t0 = time.perf_counter()
+from rag_store import VectorStore
+t1 = time.perf_counter()
+store = VectorStore(os.getenv("GEMINI_API_KEY"), metric="cosine", dedupe_answers=True, history_db=None)
+store.load_faq_from_json(sys.argv[1])
+t2 = time.perf_counter()
+heavy = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+store.encoder.warmup().join()
+t3 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "ready_s": t2 - t0, "encoder_ready_s": t3 - t0,
+                  "heavy_loaded_when_ready": heavy}))
+"""
+
+
+# ============================
+# Processo filho
+# ============================
+def child_env() -> Dict[str, str]:
+    """
+    PYTHONPATH dos scripts (src, py e a raiz). A chave fictícia só satisfaz o config:
+    o perfil não chama o LLM, então não usa a rede.
+    """
+    env = os.environ.copy()
+    paths = [os.path.join(ROOT, "src"), os.path.join(ROOT, "py"), ROOT]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    env.setdefault("GEMINI_API_KEY", "startup-profile")
+    return env
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Linhas "import time: self [us] | cumulative | imported package" -> dicts (ms e nível).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name[1:]  # espaço após o "|"
+        rows.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "level": (len(name) - len(name.lstrip())) // 2,
+        })
+    return rows
+
+
+def import_profile(modules: List[str], top: int = 15) -> Dict:
+    """
+    Importa `modules` em um processo novo com -X importtime.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True,
+    )
+    wall_s = time.perf_counter() - start
+    rows = parse_importtime(proc.stderr)
+    loaded = {r["module"] for r in rows}
+
+    report = {
+        "modules": modules,
+        "process_wall_s": round(wall_s, 3),
+        "total_import_ms": round(sum(r["self_ms"] for r in rows), 1),
+        "entry_modules_ms": {
+            r["module"]: round(r["cumulative_ms"], 1)
+            for r in rows if r["level"] == 0 and r["module"] in modules
+        },
+        "top_packages_ms": {
+            r["module"]: round(r["cumulative_ms"], 1)
+            for r in sorted(
+                (r for r in rows if "." not in r["module"]), key=lambda r: -r["cumulative_ms"]
+            )[:top]
+        },
+        "heavy_loaded": [m for m in HEAVY if m in loaded],
+    }
+    if proc.returncode != 0:
+        report["error"] = proc.stderr.strip().splitlines()[-1]
+    return report
+
+
+def ready_profile(faq_path: str) -> Dict:
+    """
+    Tempo até o FAQ estar pronto para busca e até o encoder estar carregado.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-c", _READY_SCRIPT, faq_path, json.dumps(HEAVY)],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1]}
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de inicialização (imports e tempo até pronto)")
+    parser.add_argument("--entry", choices=sorted(ENTRIES), default="streamlit")
+    parser.add_argument("--modules", nargs="+", help="Módulos a importar (substitui os do --entry)")
+    parser.add_argument("--faq", default=os.path.join("data", "faq.json"))
+    parser.add_argument("--top", type=int, default=15, help="Pacotes mais lentos listados")
+    parser.add_argument("--skip-ready", action="store_true", help="Só o perfil de imports")
+    parser.add_argument("--output", help="Arquivo JSON do relatório (padrão: stdout)")
+    args = parser.parse_args()
+
+    entry = "custom" if args.modules else args.entry
+    report = {"entry": entry, "python": sys.version.split()[0]}
+    report["imports"] = import_profile(args.modules or ENTRIES[args.entry], args.top)
+    if not args.skip_ready:
+        report["ready"] = ready_profile(os.path.abspath(args.faq))
+
+    imports = report["imports"]
+    if "error" in imports:
+        print(f"Aviso: o import falhou ({imports['error']}); tempos parciais.")
+    print(f"Imports ({entry}): {imports['total_import_ms']:.0f} ms "
+          f"(processo: {imports['process_wall_s']:.2f} s)")
+    for module, ms in imports["top_packages_ms"].items():
+        print(f"  {module:<32} {ms:>9.1f} ms")
+    print(f"Bibliotecas pesadas no import: {', '.join(imports['heavy_loaded']) or 'nenhuma'}")
+    if "ready" in report and "error" not in report["ready"]:
+        ready = report["ready"]
+        print(f"FAQ pronto em {ready['ready_s']:.2f} s; encoder carregado em {ready['encoder_ready_s']:.2f} s")
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
-import google.generativeai as genai
 from py.config import GEMINI_API_KEY
+from llm_backend import create_model
 
-# Configurar Gemini com chave do .env
-genai.configure(api_key=GEMINI_API_KEY)
-
-model = genai.GenerativeModel("gemini-1.5-flash")
+# Configurar Gemini com chave do .env (LLM_BACKEND=fake usa o modelo simulado)
+model = create_model(GEMINI_API_KEY, "gemini-1.5-flash")
 
 resp = model.generate_content("Explique os benefícios da Welhome em 2 frases.")
 print(resp.text)
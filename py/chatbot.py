@@ -1,34 +1,71 @@
-from typing import Dict
-import google.generativeai as genai
+import json
+import asyncio
+from typing import Dict, Iterator, Optional, Tuple
+from llm_backend import create_model
+from llm_call import agenerate_text, generate_text, stream_text
+from prompt_cache import PromptCache
 
 
-def init_gemini(api_key: str, model_name: str = "gemini-1.5-flash"):
+def init_gemini(api_key: str, model_name: str = "gemini-1.5-flash", backend: Optional[str] = None):
     """
     Inicializa o modelo Gemini da API Google Generative AI.
 
     Args:
         api_key (str): Chave de API do Gemini carregada do .env
         model_name (str): Nome do modelo a ser utilizado (default: gemini-1.5-flash)
+        backend (str, opcional): "gemini" ou "fake" (default: variável LLM_BACKEND)
 
     Returns:
         genai.GenerativeModel: Instância configurada do modelo Gemini
+        (ou o modelo simulado, com a mesma interface)
     """
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel(model_name)
+    return create_model(api_key, model_name, backend)
 
 
-def build_pitch(model, lead: Dict) -> str:
+def _generate(
+    model,
+    prompt: str,
+    cache: Optional[PromptCache] = None,
+    generation_config: Optional[Dict] = None,
+) -> str:
     """
-    Gera um pitch personalizado para um lead com base nos dados fornecidos.
+    Chama o Gemini consultando antes o cache exato de prompts (se informado).
 
     Args:
         model: Instância do modelo Gemini
-        lead (Dict): Dados do lead contendo nome, imóveis, localização e experiência
+        prompt (str): Prompt a enviar
+        cache (PromptCache, opcional): Cache de prompts
+        generation_config (Dict, opcional): Parâmetros de geração do Gemini
 
     Returns:
-        str: Texto do pitch gerado pelo modelo
+        str: Texto gerado (sem espaços nas pontas)
+    """
+    return generate_text(model, prompt, cache, generation_config).strip()
+
+
+def generate_stream(
+    model,
+    prompt: str,
+    cache: Optional[PromptCache] = None,
+    generation_config: Optional[Dict] = None,
+) -> Iterator[str]:
+    """
+    Gera texto em pedaços (stream=True), para exibir os primeiros tokens logo.
+
+    Args:
+        model: Instância do modelo Gemini
+        prompt (str): Prompt a enviar
+        cache (PromptCache, opcional): Cache exato de prompts
+        generation_config (Dict, opcional): Parâmetros de geração do Gemini
+
+    Yields:
+        str: Pedaços do texto gerado; juntos formam a resposta completa
     """
-    prompt = f"""
+    yield from stream_text(model, prompt, cache, generation_config)
+
+
+def _pitch_prompt(lead: Dict) -> str:
+    return f"""
     Você é um assistente da Welhome.
     O lead forneceu:
     - Nome: {lead.get("nome")}
@@ -39,11 +76,125 @@ def build_pitch(model, lead: Dict) -> str:
     Explique de forma clara e personalizada como a Welhome pode ajudar.
     Foque em: qualificação de leads, redução de tempo de venda e facilidade de uso do painel.
     """
-    resp = model.generate_content(prompt)
-    return resp.text.strip()
 
 
-def summarize_for_sales(model, lead: Dict, pitch: str) -> Dict:
+def _summary_prompt(lead: Dict, pitch: str) -> str:
+    return f"""
+    Gere um resumo estruturado e conciso (máx 6 linhas) para o vendedor.
+    Dados do lead: {lead}
+    Pitch gerado: {pitch}
+    Formato esperado (campos fixos):
+    - Nome
+    - Qtd_Imoveis
+    - Localizacao
+    - Experiencia
+    - Pontos_Chave (bullet points)
+    - Proximos_Passos (bullet points)
+    """
+
+
+# Pitch + resumo em uma única chamada, com resposta em JSON
+SALES_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "pitch": {"type": "STRING"},
+        "Nome": {"type": "STRING"},
+        "Qtd_Imoveis": {"type": "STRING"},
+        "Localizacao": {"type": "STRING"},
+        "Experiencia": {"type": "STRING"},
+        "Pontos_Chave": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "Proximos_Passos": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": [
+        "pitch", "Nome", "Qtd_Imoveis", "Localizacao",
+        "Experiencia", "Pontos_Chave", "Proximos_Passos",
+    ],
+}
+
+COMBINED_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": SALES_SCHEMA,
+}
+
+
+def _combined_prompt(lead: Dict) -> str:
+    return f"""
+    Você é um assistente da Welhome.
+    O lead forneceu:
+    - Nome: {lead.get("nome")}
+    - Imóveis: {lead.get("qtd_imoveis")}
+    - Localização: {lead.get("localizacao")}
+    - Experiência: {lead.get("experiencia")}
+
+    1. Em "pitch", explique de forma clara e personalizada como a Welhome pode ajudar.
+       Foque em: qualificação de leads, redução de tempo de venda e facilidade de uso do painel.
+    2. Nos demais campos, gere um resumo estruturado e conciso para o vendedor
+       (Pontos_Chave e Proximos_Passos como listas curtas).
+    """
+
+
+def _format_summary(data: Dict) -> str:
+    """
+    Converte o resumo estruturado no mesmo formato de texto de `summarize_for_sales`.
+    """
+    linhas = [f"- {campo}: {data[campo]}" for campo in ("Nome", "Qtd_Imoveis", "Localizacao", "Experiencia")]
+    for campo in ("Pontos_Chave", "Proximos_Passos"):
+        linhas.append(f"- {campo}:")
+        linhas.extend(f"  • {item}" for item in data[campo])
+    return "\n".join(linhas)
+
+
+def _parse_combined(texto: str, lead: Dict) -> Tuple[str, Dict]:
+    """
+    Lê a resposta JSON da chamada combinada.
+
+    Raises:
+        ValueError: se o JSON for inválido ou faltar algum campo
+    """
+    try:
+        data = json.loads(texto)
+        pitch = data["pitch"].strip()
+        resumo_texto = _format_summary(data)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Resposta combinada incompleta: {e}") from e
+    if not pitch:
+        raise ValueError("Resposta combinada sem pitch")
+    return pitch, {"resumo_texto": resumo_texto, **lead}
+
+
+def build_pitch(model, lead: Dict, cache: Optional[PromptCache] = None) -> str:
+    """
+    Gera um pitch personalizado para um lead com base nos dados fornecidos.
+
+    Args:
+        model: Instância do modelo Gemini
+        lead (Dict): Dados do lead contendo nome, imóveis, localização e experiência
+        cache (PromptCache, opcional): Cache exato de prompts
+
+    Returns:
+        str: Texto do pitch gerado pelo modelo
+    """
+    return _generate(model, _pitch_prompt(lead), cache)
+
+
+def stream_pitch(model, lead: Dict, cache: Optional[PromptCache] = None) -> Iterator[str]:
+    """
+    Versão em streaming de `build_pitch`.
+
+    Args:
+        model: Instância do modelo Gemini
+        lead (Dict): Dados do lead
+        cache (PromptCache, opcional): Cache exato de prompts
+
+    Yields:
+        str: Pedaços do pitch
+    """
+    return generate_stream(model, _pitch_prompt(lead), cache)
+
+
+def summarize_for_sales(
+    model, lead: Dict, pitch: str, cache: Optional[PromptCache] = None
+) -> Dict:
     """
     Gera um resumo estruturado e conciso do lead para uso pelo time de vendas.
 
@@ -51,22 +202,146 @@ def summarize_for_sales(model, lead: Dict, pitch: str) -> Dict:
         model: Instância do modelo Gemini
         lead (Dict): Dados do lead
         pitch (str): Pitch gerado previamente
+        cache (PromptCache, opcional): Cache exato de prompts
 
     Returns:
         Dict: Dicionário contendo o resumo estruturado e os dados originais do lead
     """
-    prompt = f"""
-    Gere um resumo estruturado e conciso (máx 6 linhas) para o vendedor.
-    Dados do lead: {lead}
-    Pitch gerado: {pitch}
-    Formato esperado (campos fixos):
-    - Nome
-    - Qtd_Imoveis
-    - Localizacao
-    - Experiencia
-    - Pontos_Chave (bullet points)
-    - Proximos_Passos (bullet points)
+    texto = _generate(model, _summary_prompt(lead, pitch), cache)
+    return {"resumo_texto": texto, **lead}
+
+
+def build_pitch_and_summary(
+    model, lead: Dict, cache: Optional[PromptCache] = None, fallback: bool = True
+) -> Optional[Tuple[str, Dict]]:
+    """
+    Gera pitch e resumo estruturado em uma única chamada (JSON com schema).
+    Se a resposta não puder ser interpretada, volta ao fluxo de duas chamadas.
+
+    Args:
+        model: Instância do modelo Gemini
+        lead (Dict): Dados do lead
+        cache (PromptCache, opcional): Cache exato de prompts
+        fallback (bool): Faz as duas chamadas extras quando o JSON é inválido.
+            Com False retorna None e o chamador decide (ex.: para limitar e medir
+            cada chamada separadamente)
+
+    Returns:
+        Tuple[str, Dict]: Pitch e o mesmo dicionário de `summarize_for_sales`
+        (ou None, com fallback=False e JSON inválido)
+    """
+    texto = _generate(model, _combined_prompt(lead), cache, COMBINED_CONFIG)
+    try:
+        return _parse_combined(texto, lead)
+    except ValueError:
+        if not fallback:
+            return None
+        pitch = build_pitch(model, lead, cache)
+        return pitch, summarize_for_sales(model, lead, pitch, cache)
+
+
+# ============================
+# Versões assíncronas
+# ============================
+async def _agenerate(
+    model,
+    prompt: str,
+    cache: Optional[PromptCache] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = 60.0,
+    generation_config: Optional[Dict] = None,
+) -> str:
     """
-    resp = model.generate_content(prompt)
-    texto = resp.text.strip()
+    Versão assíncrona de `_generate` (generate_content_async), com limite
+    opcional de concorrência (semáforo) e tempo máximo por chamada.
+
+    Raises:
+        asyncio.TimeoutError: se o Gemini não responder dentro de `timeout`
+    """
+    text = await agenerate_text(model, prompt, cache, generation_config, semaphore, timeout)
+    return text.strip()
+
+
+async def abuild_pitch(
+    model,
+    lead: Dict,
+    cache: Optional[PromptCache] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = 60.0,
+) -> str:
+    """
+    Versão assíncrona de `build_pitch`.
+
+    Args:
+        model: Instância do modelo Gemini
+        lead (Dict): Dados do lead
+        cache (PromptCache, opcional): Cache exato de prompts
+        semaphore (asyncio.Semaphore, opcional): Limite de chamadas simultâneas
+        timeout (float, opcional): Tempo máximo da chamada, em segundos
+
+    Returns:
+        str: Texto do pitch gerado pelo modelo
+    """
+    return await _agenerate(model, _pitch_prompt(lead), cache, semaphore, timeout)
+
+
+async def asummarize_for_sales(
+    model,
+    lead: Dict,
+    pitch: str,
+    cache: Optional[PromptCache] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = 60.0,
+) -> Dict:
+    """
+    Versão assíncrona de `summarize_for_sales`.
+
+    Args:
+        model: Instância do modelo Gemini
+        lead (Dict): Dados do lead
+        pitch (str): Pitch gerado previamente
+        cache (PromptCache, opcional): Cache exato de prompts
+        semaphore (asyncio.Semaphore, opcional): Limite de chamadas simultâneas
+        timeout (float, opcional): Tempo máximo da chamada, em segundos
+
+    Returns:
+        Dict: Dicionário contendo o resumo estruturado e os dados originais do lead
+    """
+    texto = await _agenerate(model, _summary_prompt(lead, pitch), cache, semaphore, timeout)
     return {"resumo_texto": texto, **lead}
+
+
+async def abuild_pitch_and_summary(
+    model,
+    lead: Dict,
+    cache: Optional[PromptCache] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = 60.0,
+    fallback: bool = True,
+) -> Optional[Tuple[str, Dict]]:
+    """
+    Versão assíncrona de `build_pitch_and_summary` (mesmo fallback de duas chamadas).
+
+    Args:
+        model: Instância do modelo Gemini
+        lead (Dict): Dados do lead
+        cache (PromptCache, opcional): Cache exato de prompts
+        semaphore (asyncio.Semaphore, opcional): Limite de chamadas simultâneas
+        timeout (float, opcional): Tempo máximo da chamada, em segundos
+        fallback (bool): Faz as duas chamadas extras quando o JSON é inválido
+            (com False retorna None)
+
+    Returns:
+        Tuple[str, Dict]: Pitch e o mesmo dicionário de `summarize_for_sales`
+        (ou None, com fallback=False e JSON inválido)
+    """
+    texto = await _agenerate(
+        model, _combined_prompt(lead), cache, semaphore, timeout, COMBINED_CONFIG
+    )
+    try:
+        return _parse_combined(texto, lead)
+    except ValueError:
+        if not fallback:
+            return None
+        pitch = await abuild_pitch(model, lead, cache, semaphore, timeout)
+        return pitch, await asummarize_for_sales(model, lead, pitch, cache, semaphore, timeout)
@@ -1,21 +1,19 @@
 # config.py
 import os
 from dotenv import load_dotenv
-from huggingface_hub import login
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
 
-# Chave da API do Gemini (obrigatória)
+# Backend do LLM: "gemini" (padrão) ou "fake" (simulado, para testes de carga)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+# Chave da API do Gemini (obrigatória com o backend real)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and LLM_BACKEND == "gemini":
     raise ValueError("GEMINI_API_KEY não encontrada. Defina no arquivo .env.")
 
-# Token do Hugging Face (opcional, usado para autenticação de modelos privados)
+# Token do Hugging Face (opcional, usado para autenticação de modelos privados).
+# O login não é feito aqui: embeddings.hf_login() só o faz quando um modelo
+# não pode ser baixado sem autenticação (evita a chamada de rede na inicialização).
 HF_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
-if HF_TOKEN:
-    # Login automático no Hugging Face Hub
-    login(HF_TOKEN)
-else:
-    print("Aviso: Nenhum HUGGINGFACE_TOKEN encontrado no .env. "
-          "Modelos privados no Hugging Face podem não funcionar.")
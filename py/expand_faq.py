@@ -1,19 +1,17 @@
 # expand_faq.py
 import json
-import google.generativeai as genai
 from dotenv import load_dotenv
 import os
+from llm_backend import backend_name, create_model
 
 # Carregar variáveis do arquivo .env
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
+# Com LLM_BACKEND=fake roda sem chave (testes locais)
+if not GEMINI_API_KEY and backend_name() == "gemini":
     raise ValueError("A chave GEMINI_API_KEY não foi encontrada no arquivo .env")
 
-# Configuração da API do Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-
 # Carregar o arquivo faq.json existente no mesmo diretório
 faq_path = os.path.join(os.path.dirname(__file__), "faq.json")
 with open(faq_path, "r", encoding="utf-8") as f:
@@ -23,7 +21,7 @@ with open(faq_path, "r", encoding="utf-8") as f:
 expanded_faq = []
 
 # Inicialização do modelo do Gemini
-model = genai.GenerativeModel("gemini-1.5-flash")
+model = create_model(GEMINI_API_KEY, "gemini-1.5-flash")
 
 # Número máximo de perguntas no dataset final
 MAX_Q = 1000
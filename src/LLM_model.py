@@ -2,34 +2,190 @@
 LLM_model.py
 Módulo responsável por interagir com o modelo Gemini da Google
 e gerar respostas/resumos a partir de prompts.
+O backend (Gemini real ou simulado) vem de llm_backend.
 """
 
-import google.generativeai as genai
-from sentence_transformers import SentenceTransformer
+import asyncio
+import weakref
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from embeddings import get_encoder
+from llm_backend import create_model
+from llm_call import agenerate_text, astream_text, generate_text, stream_text
+from prompt_cache import PromptCache
 
 
 class LLMModel:
     """Classe para interação com LLM (Gemini)."""
 
-    def __init__(self, api_key: str, embed_model: str):
-        # Configuração da API Gemini
-        genai.configure(api_key=api_key)
-
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "gemini-1.5-flash",
+        embed_model: str = "all-MiniLM-L6-v2",
+        device: Optional[str] = None,
+        cache: Optional[PromptCache] = None,
+        max_concurrency: int = 8,
+        timeout: Optional[float] = 60.0,
+        backend: Optional[str] = None,
+    ):
         # ✅ Corrigido: modelo precisa do prefixo "models/"
-        self.gemini = genai.GenerativeModel("models/gemini-1.5-flash")
+        if not model_name.startswith("models/"):
+            model_name = f"models/{model_name}"
+        self.model_name = model_name
+
+        # "gemini" (API real) ou "fake" (local, para testes de carga); padrão: LLM_BACKEND.
+        # O cliente só é criado (e o google.generativeai importado) na primeira chamada.
+        self.backend = backend
+        self._api_key = api_key
+        self._gemini = None
+        self._gemini_lock = threading.Lock()
+
+        # Encoder de embeddings (Hugging Face), compartilhado no processo
+        self.encoder = get_encoder(embed_model, device)
+
+        # Cache exato de prompts (opcional): repetições não vão à rede
+        self.cache = cache
 
-        # Encoder de embeddings (Hugging Face)
-        self.encoder = SentenceTransformer(embed_model)
+        # API assíncrona: limite de chamadas simultâneas (um semáforo por event loop)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
 
-    def generate(self, prompt: str) -> str:
+    @property
+    def gemini(self):
+        """
+        Modelo do backend (criado no primeiro uso, thread-safe).
+        """
+        if self._gemini is None:
+            with self._gemini_lock:
+                if self._gemini is None:
+                    self._gemini = create_model(self._api_key, self.model_name, self.backend)
+        return self._gemini
+
+    # ----------------------------
+    # Interface do GenerativeModel (usada por llm_call; cliente criado no primeiro uso)
+    # ----------------------------
+    def generate_content(self, prompt: str, **kwargs):
+        return self.gemini.generate_content(prompt, **kwargs)
+
+    async def generate_content_async(self, prompt: str, **kwargs):
+        return await self.gemini.generate_content_async(prompt, **kwargs)
+
+    # ----------------------------
+    # Geração
+    # ----------------------------
+    def generate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
         """
         Gera uma resposta/resumo usando o modelo Gemini.
         """
         try:
-            response = self.gemini.generate_content(prompt)
-            return response.text if response and response.text else "⚠️ Resposta vazia."
+            text = generate_text(self, prompt, self.cache, generation_config)
         except Exception as e:
             return f"[Erro na geração de conteúdo: {str(e)}]"
+        return text or "⚠️ Resposta vazia."
+
+    def generate_stream(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        status: Optional[Dict] = None,
+    ) -> Iterator[str]:
+        """
+        Gera a resposta em pedaços de texto, à medida que o Gemini os envia.
+        Quem consome junta os pedaços (''.join) para obter o texto completo.
+
+        Uma falha no meio do stream ainda gera o aviso "[Erro ...]" como último
+        pedaço (para a interface), mas o resultado real vai em `status`:
+        status["error"] recebe a mensagem (ou "empty" para resposta vazia) e
+        status["partial"] indica se algum texto já tinha sido enviado.
+        """
+        status = {} if status is None else status
+        sent = False
+        try:
+            for text in stream_text(self, prompt, self.cache, generation_config):
+                sent = True
+                yield text
+        except Exception as e:
+            status.update(error=str(e) or type(e).__name__, partial=sent)
+            yield f"[Erro na geração de conteúdo: {str(e)}]"
+            return
+
+        if not sent:
+            status.update(error="empty", partial=False)
+            yield "⚠️ Resposta vazia."
+
+    async def agenerate_stream(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        status: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Versão assíncrona de `generate_stream` (respeita o limite de concorrência
+        e preenche `status` da mesma forma).
+        """
+        status = {} if status is None else status
+        sent = False
+        try:
+            async for text in astream_text(
+                self, prompt, self.cache, generation_config, self._semaphore()
+            ):
+                sent = True
+                yield text
+        except Exception as e:
+            status.update(error=str(e) or type(e).__name__, partial=sent)
+            yield f"[Erro na geração de conteúdo: {str(e)}]"
+            return
+
+        if not sent:
+            status.update(error="empty", partial=False)
+            yield "⚠️ Resposta vazia."
+
+    async def agenerate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """
+        Versão assíncrona de `generate`, limitada a `max_concurrency` chamadas
+        simultâneas. Estouro de tempo vira mensagem de erro (como em `generate`);
+        cancelamento da tarefa é propagado normalmente.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            text = await agenerate_text(
+                self, prompt, self.cache, generation_config, self._semaphore(), timeout
+            )
+        except asyncio.TimeoutError:
+            return f"[Erro na geração de conteúdo: tempo limite de {timeout}s excedido]"
+        except Exception as e:
+            return f"[Erro na geração de conteúdo: {str(e)}]"
+        return text or "⚠️ Resposta vazia."
+
+    async def agenerate_many(
+        self,
+        prompts: List[str],
+        generation_config: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+    ) -> List[str]:
+        """
+        Gera respostas para vários prompts em paralelo (mesma ordem da entrada).
+        O tempo total fica próximo da chamada mais lenta, não da soma.
+        """
+        return await asyncio.gather(
+            *(self.agenerate(p, generation_config, timeout) for p in prompts)
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = sem
+        return sem
 
     def embed(self, text: str):
         """
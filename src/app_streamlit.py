@@ -4,72 +4,142 @@ Integra RAG (FAISS + SentenceTransformers) e Gemini 2.0 Pro.
 """
 
 import os
+import uuid
 import streamlit as st
-from rag_store import VectorStore
+from metrics import METRICS, JsonLogSink
+from rag_pipeline import RAGPipeline, build_pipeline
 from config import GEMINI_API_KEY
 
-# ============================
-# Inicialização
-# ============================
-if "store" not in st.session_state:
-    st.session_state.store = VectorStore(GEMINI_API_KEY)
+FAQ_PATH = os.path.join("data", "faq.json")
+
+# Métricas: GET /metrics (Prometheus) nesta porta e log JSON por pergunta (opcionais)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LOG = os.getenv("METRICS_LOG")
+
+
+@st.cache_resource(show_spinner="Carregando índice do FAQ...")
+def get_shared_pipeline(faq_path: str) -> RAGPipeline:
+    """
+    Pipeline único por processo, compartilhado por todas as sessões.
+    O encoder, o cliente Gemini, o índice FAISS e o cache semântico ficam uma única
+    vez em memória. A configuração (limiares, busca híbrida, cross-encoder, cache)
+    vem de `build_pipeline`, a mesma usada pelo teste de carga.
+    """
+    return build_pipeline(GEMINI_API_KEY, faq_path)
+
+
+@st.cache_resource
+def start_metrics_export() -> None:
+    """
+    Liga os exportadores uma única vez por processo (não a cada rerun).
+    """
+    if METRICS_LOG:
+        METRICS.add_sink(JsonLogSink(METRICS_LOG))
+    if METRICS_PORT:
+        METRICS.serve(METRICS_PORT)
 
-# Carregar FAQ
-faq_path = os.path.join("data", "faq.json")
-if os.path.exists(faq_path):
-    try:
-        st.session_state.store.load_faq_from_json(faq_path)
-        st.sidebar.success("✅ FAQ carregado com sucesso!")
-    except Exception as e:
-        st.sidebar.error(f"⚠️ Erro ao carregar FAQ: {e}")
-else:
-    st.sidebar.warning("⚠️ Nenhum FAQ encontrado em data/faq.json")
 
 # Configuração visual
 st.set_page_config(page_title="Welhome Assistant", layout="wide")
 st.title("🏡 Welhome Assistant - RAG + Gemini 2.0 Pro")
 
+# ============================
+# Inicialização
+# ============================
+try:
+    start_metrics_export()
+    pipeline = get_shared_pipeline(FAQ_PATH)
+    store = pipeline.store
+    if store.index is not None:
+        st.sidebar.success("✅ FAQ carregado com sucesso!")
+    else:
+        st.sidebar.warning("⚠️ Nenhum FAQ encontrado em data/faq.json")
+except Exception as e:
+    st.sidebar.error(f"⚠️ Erro ao carregar FAQ: {e}")
+    st.stop()
+
+# Histórico é por sessão (o store é compartilhado entre usuários)
+HISTORY_PAGE_SIZE = 10
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.history_page = 0
+
 # ============================
 # Input do usuário
 # ============================
 query = st.text_input("Digite sua pergunta ou dúvida sobre imóveis:")
 
 if st.button("🔍 Buscar resposta") and query:
-    with st.spinner("Gerando resposta com Gemini 2.0 Pro..."):
-        try:
-            # Busca no FAISS
-            similares = st.session_state.store.search(query, k=3)
-
-            # Contexto para o LLM
-            context = "\n".join(similares)
-            prompt = f"""
-            Você é um assistente da Welhome.
-            Pergunta do usuário: {query}
-            Contexto (FAQ + histórico): {context}
-            Responda de forma clara, breve e útil.
-            """
-
-            resposta = st.session_state.store.llm.generate(prompt)
-
-            # Exibir
-            st.subheader("Resposta")
-            st.write(resposta)
-
-            # Histórico
-            st.session_state.store.add_history(query, resposta)
+    try:
+        st.subheader("Resposta")
+
+        # Busca no FAQ, cache semântico e Gemini (tokens exibidos à medida que chegam);
+        # a interação é gravada no histórico ao final
+        result = {}
+        st.write_stream(pipeline.stream_answer(query, st.session_state.session_id, result))
+        st.session_state.last_trace = result["trace"]
+
+        if result["source"] == "faq":
+            st.caption(f"📚 Resposta do FAQ: {result['hit']['question']}")
+        if result["source"] == "error":
+            st.error("⚠️ A geração falhou; a resposta não foi salva no histórico. Tente novamente.")
+        else:
             st.success("✅ Resposta salva no histórico!")
 
-        except Exception as e:
-            st.error(f"⚠️ Erro ao gerar resposta: {e}")
+    except Exception as e:
+        st.error(f"⚠️ Erro ao gerar resposta: {e}")
+
+# Tempo de cada etapa da última pergunta desta sessão
+if "last_trace" in st.session_state:
+    trace = st.session_state.last_trace
+    with st.expander("🔍 Debug: tempo por etapa (última pergunta)"):
+        st.caption(
+            f"trace {trace['trace_id']} · origem: {trace['source']} · "
+            f"total: {trace['timings_ms']['total']:.1f} ms"
+        )
+        stages = [k for k in trace["timings_ms"] if k != "total"]
+        st.bar_chart(
+            {"etapa": stages, "ms": [trace["timings_ms"][k] for k in stages]},
+            x="etapa", y="ms", horizontal=True,
+        )
+        st.table([
+            {"span": "  " * s["depth"] + s["span"], "início (ms)": s["start_ms"], "duração (ms)": s["duration_ms"]}
+            for s in trace["spans"]
+        ])
 
 # ============================
 # Histórico
 # ============================
+cache_stats = pipeline.response_cache.stats()
+st.sidebar.caption(
+    f"⚡ Cache de respostas: {cache_stats['hits']} acertos / "
+    f"{cache_stats['misses']} erros ({cache_stats['size']} itens)"
+)
+
 st.sidebar.header("📜 Histórico de consultas")
 
-if st.session_state.store.get_history():
-    for idx, h in enumerate(st.session_state.store.get_history(), 1):
+# Só a página atual é lida do banco (não percorre o histórico inteiro a cada rerun)
+total = store.history.count(session_id=st.session_state.session_id)
+if total:
+    pages = (total - 1) // HISTORY_PAGE_SIZE + 1
+    page = min(st.session_state.history_page, pages - 1)
+    offset = page * HISTORY_PAGE_SIZE
+
+    itens = store.get_history(
+        offset=offset, limit=HISTORY_PAGE_SIZE, session_id=st.session_state.session_id
+    )
+    for idx, h in enumerate(itens, offset + 1):
         st.sidebar.markdown(f"**{idx}. {h['query']}**")
         st.sidebar.caption(h["resposta"])
+
+    if pages > 1:
+        col_prev, col_next = st.sidebar.columns(2)
+        if col_prev.button("◀ Recentes", disabled=page == 0):
+            st.session_state.history_page = page - 1
+            st.rerun()
+        if col_next.button("Antigas ▶", disabled=page >= pages - 1):
+            st.session_state.history_page = page + 1
+            st.rerun()
+        st.sidebar.caption(f"Página {page + 1} de {pages}")
 else:
     st.sidebar.info("Nenhuma consulta realizada ainda.")
@@ -0,0 +1,640 @@
+"""
+benchmark.py
+Benchmarks de recuperação do VectorStore (rodam offline, sem chamar o Gemini).
+
+Uso:
+    python src/benchmark.py --faq data/faq_expandido.json --repeat 20
+    python src/benchmark.py --index-report --synthetic 100000
+    python src/benchmark.py --storage-report --synthetic 100000
+    python src/benchmark.py --mmap-report --synthetic 200000
+    python src/benchmark.py --suite --scales 10000 100000 1000000 --output bench.json
+
+A suíte (`--suite`) usa data/faq_expandido.json (paráfrases rotuladas com a
+resposta canônica) como gabarito contra o corpus data/faq.json e grava um JSON
+comparável entre commits. Por padrão o modelo de embeddings é lido só do cache
+local do Hugging Face (HF_HUB_OFFLINE=1); use --allow-download para baixar.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from index_factory import (
+    INDEX_TYPES,
+    build_index,
+    configure_search,
+    index_bytes,
+    normalize,
+    rerank,
+)
+from rag_store import SEARCH_MODES, VectorStore
+
+
+def load_queries(json_path: str) -> List[str]:
+    """
+    Usa as perguntas do FAQ como consultas de teste.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        faq_data = json.load(f)
+    return [item.get("pergunta", item.get("q")) for item in faq_data]
+
+
+def bench_batch_search(
+    store: VectorStore, queries: List[str], k: int = 3, batch_size: int = 64
+) -> Dict[str, float]:
+    """
+    Compara `search` em loop com `search_batch` para o mesmo conjunto de consultas.
+
+    Retorno
+    -------
+    Dict com tempo total e consultas/segundo de cada modo, e o ganho (speedup).
+    """
+    # Aquecimento (carrega o encoder e estabiliza caches)
+    store.search_batch(queries[:batch_size], k=k, batch_size=batch_size)
+
+    start = time.perf_counter()
+    for q in queries:
+        store.search(q, k=k)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.search_batch(queries, k=k, batch_size=batch_size)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "queries": len(queries),
+        "loop_s": round(loop_s, 4),
+        "loop_qps": round(len(queries) / loop_s, 1),
+        "batch_s": round(batch_s, 4),
+        "batch_qps": round(len(queries) / batch_s, 1),
+        "speedup": round(loop_s / batch_s, 2),
+    }
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """
+    Fração dos k vizinhos exatos que aparecem nos k resultados do índice.
+    """
+    k = truth.shape[1]
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def bench_index_types(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    k: int = 3,
+    index_types: Sequence[str] = INDEX_TYPES,
+    nprobe_values: Sequence[int] = (1, 4, 16, 64),
+    ef_values: Sequence[int] = (16, 64, 256),
+    index_options: Optional[Dict[str, int]] = None,
+    metric: str = "l2",
+) -> List[Dict]:
+    """
+    Relatório recall@k x latência de cada tipo de índice contra o índice flat (exato).
+
+    Cada linha traz o tipo, o parâmetro de busca (nprobe/efSearch), tempo de
+    construção, latência média por consulta (ms) e recall@k.
+    """
+    if metric == "cosine":
+        corpus, queries = normalize(corpus), normalize(queries)
+    corpus = np.ascontiguousarray(corpus, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    ids = np.arange(len(corpus), dtype="int64")
+    index_options = index_options or {}
+
+    exact = build_index(corpus, ids, "flat", metric)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(corpus, ids, index_type, metric, **index_options)
+        build_s = time.perf_counter() - start
+
+        if index_type.startswith("ivf"):
+            sweep = [("nprobe", v) for v in nprobe_values]
+        elif index_type == "hnsw":
+            sweep = [("ef_search", v) for v in ef_values]
+        else:
+            sweep = [(None, None)]
+
+        for param, value in sweep:
+            if param:
+                configure_search(index, **{param: value})
+
+            start = time.perf_counter()
+            _, found = index.search(queries, k)
+            search_s = time.perf_counter() - start
+
+            report.append({
+                "index_type": index_type,
+                "param": param,
+                "value": value,
+                "build_s": round(build_s, 4),
+                "latency_ms": round(1000 * search_s / len(queries), 4),
+                f"recall@{k}": round(recall_at_k(found, truth), 4),
+            })
+    return report
+
+
+def bench_storage(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    k: int = 3,
+    index_types: Sequence[str] = ("flat", "sq_fp16", "sq8", "pq"),
+    rerank_factors: Sequence[int] = (0, 4),
+    index_options: Optional[Dict[str, int]] = None,
+    metric: str = "l2",
+) -> List[Dict]:
+    """
+    Relatório memória x latência x recall@k do armazenamento comprimido
+    (float16, int8, PQ), sem e com re-ranking pelos vetores float32.
+
+    Cada linha traz o tipo, o fator de re-ranking (0 = desligado), o tamanho
+    do índice (bytes totais e por vetor), latência média por consulta (ms) e recall@k.
+    """
+    if metric == "cosine":
+        corpus, queries = normalize(corpus), normalize(queries)
+    corpus = np.ascontiguousarray(corpus, dtype="float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    ids = np.arange(len(corpus), dtype="int64")
+    index_options = index_options or {}
+
+    exact = build_index(corpus, ids, "flat", metric)
+    _, truth = exact.search(queries, k)
+
+    report = []
+    for index_type in index_types:
+        index = build_index(corpus, ids, index_type, metric, **index_options)
+        size = index_bytes(index)
+
+        for factor in rerank_factors:
+            start = time.perf_counter()
+            if factor:
+                # IDs = posições no corpus, então os candidatos indexam a matriz direto
+                _, candidates = index.search(queries, min(k * factor, len(corpus)))
+                _, found = rerank(queries, candidates, corpus, metric)
+                found = found[:, :k]
+            else:
+                _, found = index.search(queries, k)
+            search_s = time.perf_counter() - start
+
+            report.append({
+                "index_type": index_type,
+                "rerank_factor": factor,
+                "index_bytes": size,
+                "bytes_per_vector": round(size / len(corpus), 1),
+                "latency_ms": round(1000 * search_s / len(queries), 4),
+                f"recall@{k}": round(recall_at_k(found, truth), 4),
+            })
+    return report
+
+
+# Processo "worker" do relatório de mmap: abre o índice, busca e informa a memória
+_MMAP_WORKER = """
+import sys, json
+import numpy as np
+sys.path.insert(0, sys.argv[1])
+from index_factory import read_index
+index = read_index(sys.argv[2], mmap=sys.argv[3] == "mmap")
+index.search(np.load(sys.argv[4]), 10)
+mem = {}
+for line in open("/proc/self/smaps_rollup"):
+    parts = line.split()
+    if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+        mem[parts[0][:-1]] = int(parts[1]) / 1024
+print(json.dumps(mem), flush=True)
+sys.stdin.read()  # fica vivo até todos os workers medirem
+"""
+
+
+def bench_mmap(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    index_types: Sequence[str] = ("flat", "sq8", "hnsw"),
+    metric: str = "cosine",
+    workers: int = 2,
+) -> List[Dict]:
+    """
+    Memória de `workers` processos simultâneos abrindo o mesmo índice salvo,
+    carregado na heap ("heap") ou mapeado ("mmap", como `VectorStore(mmap=True)`).
+
+    Por worker: RSS, PSS (páginas compartilhadas divididas entre os processos) e
+    memória privada, em MB; "pss_total_mb" é o custo real somado. Só no Linux
+    (/proc/self/smaps_rollup).
+    """
+    if metric == "cosine":
+        corpus, queries = normalize(corpus), normalize(queries)
+    corpus = np.ascontiguousarray(corpus, dtype="float32")
+    ids = np.arange(len(corpus), dtype="int64")
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        query_path = os.path.join(tmp, "queries.npy")
+        np.save(query_path, np.ascontiguousarray(queries, dtype="float32"))
+
+        for index_type in index_types:
+            index_path = os.path.join(tmp, f"{index_type}.index")
+            faiss.write_index(build_index(corpus, ids, index_type, metric), index_path)
+
+            for mode in ("heap", "mmap"):
+                procs = [
+                    subprocess.Popen(
+                        [sys.executable, "-c", _MMAP_WORKER, src_dir, index_path, mode, query_path],
+                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+                    )
+                    for _ in range(workers)
+                ]
+                mems = [json.loads(p.stdout.readline()) for p in procs]
+                for p in procs:
+                    p.communicate("")
+
+                report.append({
+                    "index_type": index_type,
+                    "mode": mode,
+                    "workers": workers,
+                    "file_mb": round(os.path.getsize(index_path) / 2**20, 1),
+                    "rss_mb": [round(m["Rss"], 1) for m in mems],
+                    "pss_mb": [round(m["Pss"], 1) for m in mems],
+                    "private_mb": [round(m["Private_Clean"] + m["Private_Dirty"], 1) for m in mems],
+                    "pss_total_mb": round(sum(m["Pss"] for m in mems), 1),
+                })
+    return report
+
+
+# ============================
+# Suíte completa (gabarito rotulado + corpora sintéticos)
+# ============================
+def latency_stats(samples_s: Sequence[float]) -> Dict[str, float]:
+    """
+    Percentis de latência (ms) e vazão de uma série de medições por consulta.
+    """
+    ms = np.asarray(samples_s, dtype="float64") * 1000
+    total_s = float(np.sum(samples_s))
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "qps": round(len(ms) / total_s, 1) if total_s else 0.0,
+    }
+
+
+def label_metrics(ranked: Sequence[Sequence[str]], labels: Sequence[str], k: int) -> Dict[str, float]:
+    """
+    recall@k (a resposta certa aparece entre os k primeiros) e MRR@k,
+    a partir do rótulo (resposta) de cada resultado, na ordem da busca.
+    """
+    hits, rr = 0, 0.0
+    for found, label in zip(ranked, labels):
+        found = list(found)[:k]
+        if label in found:
+            hits += 1
+            rr += 1.0 / (found.index(label) + 1)
+    n = max(len(labels), 1)
+    return {f"recall@{k}": round(hits / n, 4), f"mrr@{k}": round(rr / n, 4)}
+
+
+def load_labeled(json_path: str, exclude: Sequence[str] = ()) -> Tuple[List[str], List[str]]:
+    """
+    Paráfrases e suas respostas canônicas (rótulos). Perguntas presentes no
+    corpus (`exclude`) ficam de fora, para não medir acertos triviais.
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    skip = set(exclude)
+    pairs = [
+        (item.get("pergunta", item.get("q")), item.get("resposta", item.get("a")))
+        for item in items
+    ]
+    pairs = [(q, a) for q, a in pairs if q not in skip]
+    return [q for q, _ in pairs], [a for _, a in pairs]
+
+
+def synthetic_corpus(base: np.ndarray, n: int, seed: int = 42, chunk: int = 100_000) -> np.ndarray:
+    """
+    `n` vetores de ruído em torno dos embeddings reais (distratores), em float32 e em blocos.
+    """
+    rng = np.random.default_rng(seed)
+    scale = float(base.std())
+    out = np.empty((n, base.shape[1]), dtype="float32")
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        rows = base[rng.integers(0, len(base), size)]
+        out[start:start + size] = rows + scale * rng.standard_normal(rows.shape, dtype="float32")
+    return out
+
+
+def bench_encode(encoder, texts: List[str], batch_size: int = 64) -> Dict[str, float]:
+    """
+    Vazão do encoder (frases/s), já aquecido.
+    """
+    encoder.encode(texts[:batch_size], batch_size=batch_size, convert_to_numpy=True)
+    start = time.perf_counter()
+    encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "sentences": len(texts),
+        "encode_s": round(elapsed, 4),
+        "sentences_per_s": round(len(texts) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def bench_search_modes(
+    corpus_path: str,
+    queries: List[str],
+    labels: List[str],
+    k: int = 3,
+    index_types: Sequence[str] = INDEX_TYPES,
+    search_modes: Sequence[str] = SEARCH_MODES,
+    metric: str = "cosine",
+    embed_model: str = "all-MiniLM-L6-v2",
+) -> List[Dict]:
+    """
+    VectorStore de ponta a ponta (encode da consulta + busca) para cada tipo de
+    índice e modo de busca: tempo de construção, memória, latência e qualidade.
+    """
+    report = []
+    for index_type in index_types:
+        for mode in search_modes:
+            store = VectorStore(
+                os.getenv("GEMINI_API_KEY", "offline"),
+                embed_model=embed_model,
+                cache_dir=None,
+                metric=metric,
+                index_type=index_type,
+                history_db=None,
+                search_mode=mode,
+                dedupe_answers=True,
+            )
+            start = time.perf_counter()
+            store.load_faq_from_json(corpus_path)
+            build_s = time.perf_counter() - start
+
+            store.search_batch(queries[:8], k=k)  # aquecimento
+            samples, ranked = [], []
+            for q in queries:
+                start = time.perf_counter()
+                hit = store.search_batch([q], k=k)[0]
+                samples.append(time.perf_counter() - start)
+                ranked.append(hit["texts"])
+
+            memory = index_bytes(store.index)
+            if store.embeddings is not None:
+                memory += store.embeddings.nbytes
+            report.append({
+                "index_type": index_type,
+                "search_mode": mode,
+                "entries": len(store.entries),
+                "build_s": round(build_s, 4),
+                "index_bytes": memory,
+                **latency_stats(samples),
+                **label_metrics(ranked, labels, k),
+            })
+    return report
+
+
+def bench_scale(
+    corpus: np.ndarray,
+    corpus_labels: List[str],
+    queries: np.ndarray,
+    labels: List[str],
+    scales: Sequence[int],
+    k: int = 3,
+    index_types: Sequence[str] = INDEX_TYPES,
+    metric: str = "cosine",
+    index_options: Optional[Dict[str, int]] = None,
+) -> List[Dict]:
+    """
+    Corpus real + N distratores sintéticos (sem rótulo) para cada escala:
+    construção, memória, latência por consulta e recall@k / MRR por tipo de índice.
+    """
+    if metric == "cosine":
+        corpus, queries = normalize(corpus), normalize(queries)
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    index_options = index_options or {}
+
+    report = []
+    for n in scales:
+        full = np.vstack([corpus, synthetic_corpus(corpus, n)]).astype("float32")
+        if metric == "cosine":
+            faiss.normalize_L2(full)
+        ids = np.arange(len(full), dtype="int64")
+        # Distratores (posição >= len) não têm rótulo: ficam como None no ranking,
+        # ocupando a posição (senão um acerto atrás deles contaria como 1º no MRR)
+        row_labels = list(corpus_labels)
+
+        for index_type in index_types:
+            start = time.perf_counter()
+            index = build_index(full, ids, index_type, metric, **index_options)
+            build_s = time.perf_counter() - start
+
+            index.search(queries[:8], k)  # aquecimento
+            samples, ranked = [], []
+            for q in queries:
+                start = time.perf_counter()
+                _, found = index.search(q[None, :], k)
+                samples.append(time.perf_counter() - start)
+                ranked.append([row_labels[i] if 0 <= i < len(row_labels) else None for i in found[0]])
+
+            report.append({
+                "index_type": index_type,
+                "vectors": len(full),
+                "build_s": round(build_s, 4),
+                "index_bytes": index_bytes(index),
+                **latency_stats(samples),
+                **label_metrics(ranked, labels, k),
+            })
+            del index
+        del full
+    return report
+
+
+def run_metadata(args: argparse.Namespace) -> Dict:
+    """
+    Contexto da execução (commit, versões, parâmetros) para comparar resultados.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    try:
+        import resource
+
+        # ru_maxrss: KB no Linux, bytes no macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    except ImportError:
+        rss_mb = None
+
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "faiss": getattr(faiss, "__version__", None),
+        "numpy": np.__version__,
+        "peak_rss_mb": round(rss_mb, 1) if rss_mb is not None else None,
+        "args": vars(args),
+    }
+
+
+def run_suite(args: argparse.Namespace) -> Dict:
+    """
+    Suíte completa: encoder, VectorStore por tipo de índice x modo de busca
+    e escalas sintéticas.
+    """
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        corpus_items = json.load(f)
+    corpus_questions = [item.get("pergunta", item.get("q")) for item in corpus_items]
+    corpus_labels = [item.get("resposta", item.get("a")) for item in corpus_items]
+    queries, labels = load_labeled(args.labeled, exclude=corpus_questions)
+
+    results: Dict = {"queries": len(queries), "corpus_entries": len(corpus_items)}
+
+    results["search_modes"] = bench_search_modes(
+        args.corpus,
+        queries,
+        labels,
+        k=args.k,
+        index_types=args.index_types,
+        metric=args.metric,
+        embed_model=args.embed_model,
+    )
+
+    from embeddings import get_encoder
+
+    encoder = get_encoder(args.embed_model)
+    results["encode"] = bench_encode(encoder, queries * args.repeat, args.batch_size)
+
+    if args.scales:
+        corpus_embs = encoder.encode(corpus_questions, convert_to_numpy=True)
+        query_embs = encoder.encode(queries, convert_to_numpy=True)
+        results["scale"] = bench_scale(
+            corpus_embs,
+            corpus_labels,
+            query_embs,
+            labels,
+            args.scales,
+            k=args.k,
+            index_types=args.index_types,
+            metric=args.metric,
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de busca do VectorStore")
+    parser.add_argument("--faq", default=os.path.join("data", "faq_expandido.json"))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="Repete as perguntas do FAQ para aumentar o volume")
+    parser.add_argument("--index-report", action="store_true",
+                        help="Compara recall@k x latência dos tipos de índice")
+    parser.add_argument("--storage-report", action="store_true",
+                        help="Compara memória x recall@k do armazenamento comprimido (fp16, sq8, pq)")
+    parser.add_argument("--mmap-report", action="store_true",
+                        help="Memória de 2 processos com o índice na heap x mapeado (Linux)")
+    parser.add_argument("--rerank-factor", type=int, default=4,
+                        help="Candidatos por resultado no re-ranking do relatório de armazenamento")
+    parser.add_argument("--metric", choices=["l2", "cosine"],
+                        help="Padrão: cosine na suíte (como nos apps), l2 nos demais relatórios")
+    parser.add_argument("--search-mode", default="dense", choices=list(SEARCH_MODES))
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Vetores sintéticos adicionados ao corpus no relatório de índices")
+    parser.add_argument("--suite", action="store_true",
+                        help="Suíte completa: índices x modos de busca, encoder e escalas sintéticas")
+    parser.add_argument("--corpus", default=os.path.join("data", "faq.json"),
+                        help="FAQ indexado na suíte")
+    parser.add_argument("--labeled", default=os.path.join("data", "faq_expandido.json"),
+                        help="Paráfrases rotuladas com a resposta canônica (gabarito da suíte)")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10_000],
+                        help="Tamanhos dos corpora sintéticos da suíte (ex.: 10000 100000 1000000)")
+    parser.add_argument("--index-types", nargs="*", default=list(INDEX_TYPES), choices=INDEX_TYPES,
+                        help="Tipos de índice avaliados na suíte")
+    parser.add_argument("--embed-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--output", help="Também grava o resultado neste arquivo JSON")
+    parser.add_argument("--allow-download", action="store_true",
+                        help="Permite baixar o modelo (padrão: só o cache local do Hugging Face)")
+    args = parser.parse_args()
+
+    if not args.allow_download:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    if args.metric is None:
+        args.metric = "cosine" if args.suite else "l2"
+
+    if args.suite:
+        results = {"meta": None, **run_suite(args)}
+        results["meta"] = run_metadata(args)
+        _emit(results, args.output)
+        return
+
+    store = VectorStore(
+        os.getenv("GEMINI_API_KEY", "offline"),
+        embed_model=args.embed_model,
+        cache_dir=None,
+        metric=args.metric,
+        history_db=None,
+        search_mode=args.search_mode,
+    )
+    store.load_faq_from_json(args.faq)
+
+    queries = load_queries(args.faq) * args.repeat
+    results = {
+        "batch_search": bench_batch_search(
+            store, queries, k=args.k, batch_size=args.batch_size
+        )
+    }
+
+    if args.index_report or args.storage_report or args.mmap_report:
+        corpus = store.encoder.encode(store.texts, convert_to_numpy=True)
+        if args.synthetic:
+            # Ruído em torno dos embeddings reais, para simular uma base maior
+            corpus = np.vstack([corpus, synthetic_corpus(corpus, args.synthetic)])
+        query_embs = store.encoder.encode(load_queries(args.faq), convert_to_numpy=True)
+
+        if args.index_report:
+            results["index_report"] = bench_index_types(
+                corpus, query_embs, k=args.k, metric=args.metric
+            )
+        if args.mmap_report:
+            results["mmap_report"] = bench_mmap(corpus, query_embs, metric=args.metric)
+        if args.storage_report:
+            results["storage_report"] = bench_storage(
+                corpus,
+                query_embs,
+                k=args.k,
+                rerank_factors=(0, args.rerank_factor),
+                metric=args.metric,
+            )
+
+    results["meta"] = run_metadata(args)
+    _emit(results, args.output)
+
+
+def _emit(results: Dict, output: Optional[str]) -> None:
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+bm25.py
+Índice invertido BM25 em memória para busca lexical no FAQ (termos exatos como
+bairros, valores ou "comissão"), com remoção de acentos e stopwords em português.
+"""
+
+import re
+import math
+import heapq
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Stopwords do português (já sem acentos, pois são comparadas após `fold_accents`)
+PT_STOPWORDS = frozenset(
+    """
+    a ao aos aquela aquelas aquele aqueles aquilo as ate com como da das de dela
+    delas dele deles depois do dos e ela elas ele eles em entre era eram essa
+    essas esse esses esta estas este estes eu foi foram ha isso isto ja la lhe
+    lhes mais mas me mesmo meu meus minha minhas muito na nao nas nem no nos
+    nossa nossas nosso nossos num numa o os ou para pela pelas pelo pelos por
+    qual quando que quem se sem ser seu seus so sua suas tambem te tem ter teu
+    tua um uma umas uns voce voces vos
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fold_accents(text: str) -> str:
+    """
+    Minúsculas e sem acentos ("Comissão" -> "comissao").
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Termos de um texto: sem acentos, sem pontuação e sem stopwords.
+    """
+    return [t for t in _TOKEN_RE.findall(fold_accents(text)) if t not in PT_STOPWORDS]
+
+
+class BM25Index:
+    """
+    Índice invertido termo -> {id do documento: frequência}, com score BM25 (Okapi).
+
+    Os IDs são os mesmos das entradas do VectorStore, então os resultados podem
+    ser fundidos com os da busca vetorial ou usados como pré-filtro dela.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.idf: Dict[str, float] = {}
+        self.avgdl = 0.0
+
+    def build(self, docs: Dict[int, str]) -> "BM25Index":
+        """
+        (Re)constrói o índice a partir de {id: texto}.
+        """
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_len: Dict[int, int] = {}
+
+        for doc_id, text in docs.items():
+            terms = tokenize(text)
+            doc_len[doc_id] = len(terms)
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, {})[doc_id] = tf
+
+        n = len(doc_len)
+        self.postings = postings
+        self.doc_len = doc_len
+        self.avgdl = sum(doc_len.values()) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs_tf) + 0.5) / (len(docs_tf) + 0.5))
+            for term, docs_tf in postings.items()
+        }
+        return self
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Até `k` pares (id, score BM25) com score positivo, do maior para o menor.
+        """
+        if not self.doc_len:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            docs_tf = self.postings.get(term)
+            if not docs_tf:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in docs_tf.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / (self.avgdl or 1.0))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[int]:
+    """
+    Funde rankings (listas de IDs, melhor primeiro) por RRF: soma de 1 / (k + posição).
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
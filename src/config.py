@@ -1,21 +1,16 @@
 import os
 from dotenv import load_dotenv
-from huggingface_hub import login
 
 # Carrega .env local (não afeta no Streamlit Cloud)
 load_dotenv()
 
-# GEMINI
+# Backend do LLM: "gemini" (padrão) ou "fake" (simulado, para testes de carga)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+# GEMINI (chave obrigatória só com o backend real)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and LLM_BACKEND == "gemini":
     raise ValueError("Erro: variável GEMINI_API_KEY não encontrada.")
 
-# HUGGING FACE
+# HUGGING FACE (login feito sob demanda por embeddings.hf_login, só para modelos privados)
 HF_TOKEN = os.getenv("HUGGINGFACE_TOKEN", None)
-if HF_TOKEN:
-    try:
-        login(HF_TOKEN)
-    except Exception as e:
-        print(f"Aviso: não foi possível logar no Hugging Face ({e}).")
-else:
-    print("Aviso: nenhum HUGGINGFACE_TOKEN encontrado. Modelos privados podem falhar.")
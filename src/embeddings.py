@@ -0,0 +1,138 @@
+"""
+embeddings.py
+Registro de encoders de embeddings (SentenceTransformers) compartilhados
+por todo o processo, com carregamento preguiçoso no primeiro uso.
+O login no Hugging Face também é preguiçoso: só acontece se um modelo
+não puder ser baixado sem autenticação (repositório privado ou restrito).
+"""
+
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+_HF_LOGIN_LOCK = threading.Lock()
+_hf_logged_in = False
+
+
+def hf_login() -> bool:
+    """
+    Login no Hugging Face Hub com HUGGINGFACE_TOKEN (uma vez por processo).
+
+    Retorno
+    -------
+    bool
+        True se há token e o login foi feito; False sem token.
+    """
+    global _hf_logged_in
+    token = os.getenv("HUGGINGFACE_TOKEN")
+    if not token:
+        return False
+    with _HF_LOGIN_LOCK:
+        if not _hf_logged_in:
+            from huggingface_hub import login
+
+            login(token)
+            _hf_logged_in = True
+    return True
+
+
+def load_hf_model(factory: Callable, model_name: str, **kwargs):
+    """
+    Carrega um modelo do Hugging Face sem autenticação; se o acesso falhar
+    (OSError, como nos repositórios privados) e houver token, faz login e tenta de novo.
+    """
+    try:
+        return factory(model_name, **kwargs)
+    except OSError:
+        if not hf_login():
+            raise
+        return factory(model_name, **kwargs)
+
+
+class LazyEncoder:
+    """
+    Encoder que só carrega os pesos do SentenceTransformer no primeiro `encode`.
+    Expõe a mesma interface usada no projeto (`encode`, dimensão dos embeddings).
+    """
+
+    def __init__(self, model_name: str, device: Optional[str] = None) -> None:
+        self.model_name = model_name
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    @property
+    def model(self):
+        """
+        Instância do SentenceTransformer (carregada uma única vez, thread-safe).
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = load_hf_model(SentenceTransformer, self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def warmup(self) -> threading.Thread:
+        """
+        Carrega o modelo e roda um `encode` curto em uma thread daemon, para que
+        a interface apareça sem esperar os pesos. Chamadas repetidas reaproveitam a thread.
+        """
+        with self._lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(
+                    target=self._warmup, name=f"warmup-{self.model_name}", daemon=True
+                )
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    def _warmup(self) -> None:
+        try:
+            self.encode(["aquecimento do encoder"])
+        except Exception as e:
+            # O erro reaparece (e é tratado) no primeiro uso real
+            print(f"Aviso: falha ao pré-carregar {self.model_name} ({e}).")
+
+    def encode(self, sentences, **kwargs):
+        """
+        Gera embeddings (mesma assinatura de SentenceTransformer.encode).
+        """
+        return self.model.encode(sentences, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+_ENCODERS: Dict[Tuple[str, Optional[str]], LazyEncoder] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_encoder(model_name: str, device: Optional[str] = None) -> LazyEncoder:
+    """
+    Retorna o encoder compartilhado para (modelo, device), criando-o se necessário.
+
+    Parâmetros
+    ----------
+    model_name : str
+        Nome do modelo SentenceTransformers (ex.: "all-MiniLM-L6-v2").
+    device : str, opcional
+        Dispositivo ("cpu", "cuda", ...). None deixa a biblioteca escolher.
+
+    Retorno
+    -------
+    LazyEncoder
+        Sempre a mesma instância para a mesma chave dentro do processo.
+    """
+    key = (model_name, device)
+    with _REGISTRY_LOCK:
+        encoder = _ENCODERS.get(key)
+        if encoder is None:
+            encoder = LazyEncoder(model_name, device)
+            _ENCODERS[key] = encoder
+        return encoder
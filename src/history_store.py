@@ -0,0 +1,267 @@
+"""
+history_store.py
+Histórico persistente de interações/leads: gravação append-only em SQLite
+(WAL, um commit curto por linha) e índice FAISS em disco para busca semântica.
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from index_factory import new_index, normalize
+
+
+class HistoryStore:
+    """
+    Histórico com:
+    - tabela `history` (id, session_id, lead_id, resumo, created) em SQLite;
+    - índice FAISS (IDs = ids das linhas) salvo em `index_path`;
+    - paginação por sessão, para a interface não percorrer o histórico inteiro.
+
+    Cada `add()` é confirmado na hora (no WAL com synchronous=NORMAL o commit não
+    faz fsync): nenhuma transação de escrita fica aberta entre chamadas, então
+    vários processos podem usar o mesmo banco e veem as linhas uns dos outros.
+    `page()`/`count()` só leem as linhas, nunca calculam embeddings. O encode e a
+    indexação ficam para a próxima `search()`, em um único lote (inclusive linhas
+    gravadas por outros processos), e o índice só é regravado no disco a cada
+    `save_every` vetores novos (e no `close()`): se o processo cair antes, as
+    linhas que faltarem no índice são indexadas de novo na próxima carga
+    (`_ensure_index`).
+    """
+
+    def __init__(
+        self,
+        encoder,
+        db_path: str = os.path.join("models", "leads.db"),
+        index_path: Optional[str] = os.path.join("base", "history.faiss"),
+        save_every: int = 256,
+        legacy_json: Optional[str] = os.path.join("base", "history.json"),
+    ) -> None:
+        self.encoder = encoder
+        self.db_path = db_path
+        self.index_path = index_path
+        self.save_every = save_every
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                lead_id TEXT,
+                resumo TEXT,
+                created REAL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS history_session ON history (session_id, id)"
+        )
+        self._conn.commit()
+
+        self._lock = threading.RLock()
+        self._indexed_upto = 0  # maior id já no índice carregado (ids só crescem)
+        self._unsaved = 0  # vetores no índice em memória que ainda não estão no disco
+        self.index = None
+
+        # Importa o histórico antigo (base/history.json) uma única vez
+        if legacy_json and os.path.exists(legacy_json) and self.count() == 0:
+            self._import_legacy(legacy_json)
+
+        atexit.register(self.close)
+
+    # ----------------------------
+    # Escrita
+    # ----------------------------
+    def add(self, lead_id: str, resumo: str, session_id: Optional[str] = None) -> int:
+        """
+        Acrescenta uma entrada; retorna o id da linha.
+        """
+        with self._lock:
+            with self._conn:  # commit imediato: não segura o lock de escrita do banco
+                cur = self._conn.execute(
+                    "INSERT INTO history (session_id, lead_id, resumo, created) VALUES (?, ?, ?, ?)",
+                    (session_id, lead_id, resumo, time.time()),
+                )
+            return cur.lastrowid
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            if self._unsaved:
+                self._save_index()
+            self._conn.close()
+            self._conn = None
+
+    # ----------------------------
+    # Leitura
+    # ----------------------------
+    def count(self, session_id: Optional[str] = None) -> int:
+        with self._lock:
+            if session_id is None:
+                row = self._conn.execute("SELECT COUNT(*) FROM history").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM history WHERE session_id = ?", (session_id,)
+                ).fetchone()
+            return row[0]
+
+    def page(
+        self, offset: int = 0, limit: int = 10, session_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Uma página do histórico, da entrada mais recente para a mais antiga.
+        """
+        with self._lock:
+            sql = "SELECT id, session_id, lead_id, resumo, created FROM history"
+            params: list = []
+            if session_id is not None:
+                sql += " WHERE session_id = ?"
+                params.append(session_id)
+            sql += " ORDER BY id DESC LIMIT ? OFFSET ?"
+            params += [limit, offset]
+            return [self._row(r) for r in self._conn.execute(sql, params)]
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+        """
+        Busca semântica no histórico; cada resultado traz lead_id, resumo e score.
+        """
+        with self._lock:
+            self._sync_index()
+            if self.index is None or self.index.ntotal == 0:
+                return []
+
+            emb = normalize(self.encoder.encode([query], convert_to_numpy=True))
+            scores, ids = self.index.search(emb, min(top_k, self.index.ntotal))
+            found = [int(i) for i in ids[0] if i != -1]
+            if not found:
+                return []
+
+            marks = ",".join("?" * len(found))
+            rows = {
+                r[0]: self._row(r)
+                for r in self._conn.execute(
+                    f"SELECT id, session_id, lead_id, resumo, created FROM history WHERE id IN ({marks})",
+                    found,
+                )
+            }
+            results = []
+            for score, row_id in zip(scores[0], ids[0]):
+                if int(row_id) in rows:
+                    results.append({**rows[int(row_id)], "score": float(score)})
+            return results
+
+    # ----------------------------
+    # Índice
+    # ----------------------------
+    def _sync_index(self) -> None:
+        """
+        Indexa as linhas novas (um lote de encode) e grava o índice a cada `save_every`.
+        """
+        if self.index is None:
+            # Primeira busca: carrega/cria e indexa tudo o que faltar, inclusive as novas
+            self._ensure_index()
+        else:
+            new = [
+                r[0]
+                for r in self._conn.execute(
+                    "SELECT id FROM history WHERE id > ? ORDER BY id", (self._indexed_upto,)
+                )
+            ]
+            if new:
+                self._index_rows(new)
+                self._indexed_upto = new[-1]
+                self._unsaved += len(new)
+
+        if self._unsaved >= self.save_every:
+            self._save_index()
+
+    def _ensure_index(self) -> None:
+        """
+        Carrega o índice do disco (ou cria) e indexa linhas que ainda não estão nele,
+        por exemplo após uma queda entre o commit e a gravação do índice.
+        """
+        if self.index is not None:
+            return
+
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                self.index = faiss.read_index(self.index_path)
+            except Exception as e:
+                print(f"Aviso: índice do histórico inválido, reconstruindo ({e}).")
+
+        indexed = set()
+        if self.index is not None:
+            indexed = set(faiss.vector_to_array(self.index.id_map).tolist())
+
+        all_ids = [r[0] for r in self._conn.execute("SELECT id FROM history ORDER BY id")]
+        missing = [i for i in all_ids if i not in indexed]
+        if missing:
+            self._index_rows(missing)
+            self._save_index()
+        self._indexed_upto = all_ids[-1] if all_ids else 0
+
+    def _index_rows(self, row_ids: List[int], chunk: int = 500) -> None:
+        # Em blocos: limita variáveis do SQL e o tamanho de cada lote do encoder
+        for start in range(0, len(row_ids), chunk):
+            part = row_ids[start:start + chunk]
+            marks = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT id, resumo FROM history WHERE id IN ({marks})", part
+            ).fetchall()
+            if not rows:
+                continue
+
+            embs = normalize(self.encoder.encode([r[1] for r in rows], convert_to_numpy=True))
+            if self.index is None:
+                self.index = new_index(embs.shape[1], "flat", "cosine")
+            self.index.add_with_ids(embs, np.array([r[0] for r in rows], dtype="int64"))
+
+    def _save_index(self) -> None:
+        if not self.index_path or self.index is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            faiss.write_index(self.index, self.index_path + ".tmp")
+            os.replace(self.index_path + ".tmp", self.index_path)
+            self._unsaved = 0
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o índice do histórico ({e}).")
+
+    def _import_legacy(self, json_path: str) -> None:
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except Exception as e:
+            print(f"Aviso: não foi possível importar {json_path} ({e}).")
+            return
+
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT INTO history (session_id, lead_id, resumo, created) VALUES (NULL, ?, ?, ?)",
+                [(item.get("lead_id"), item.get("resumo"), now) for item in items],
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _row(r) -> Dict:
+        return {
+            "id": r[0],
+            "session_id": r[1],
+            "lead_id": r[2],
+            "resumo": r[3],
+            "created": r[4],
+        }
@@ -0,0 +1,261 @@
+"""
+index_factory.py
+Construção dos índices FAISS usados pelo VectorStore: busca exata (flat),
+exaustiva sobre vetores comprimidos (float16, int8, PQ) ou aproximada
+(IVF-Flat, IVF-PQ, HNSW), sempre com IDs explícitos.
+"""
+
+import math
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "sq_fp16", "sq8", "pq", "ivf_flat", "ivf_pq", "hnsw")
+
+# Armazenamento comprimido (busca exaustiva): float16 (2 bytes/dim), int8 (1 byte/dim)
+SCALAR_QUANTIZERS = {
+    "sq_fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+METRICS = {"l2": faiss.METRIC_L2, "cosine": faiss.METRIC_INNER_PRODUCT}
+
+
+def _auto_nlist(n_train: int) -> int:
+    """
+    Número de listas do IVF: ~4·sqrt(N), limitado a ~39 pontos de treino por lista.
+    """
+    return max(1, min(int(4 * math.sqrt(n_train)), n_train // 39))
+
+
+def _pq_subquantizers(dim: int, pq_m: int) -> int:
+    """
+    Maior número de subquantizadores <= pq_m que divide a dimensão.
+    """
+    m = max(1, min(pq_m, dim))
+    while dim % m:
+        m -= 1
+    return m
+
+
+def _pq_nbits(n_train: int) -> int:
+    """
+    Bits por código PQ (até 8), sem exigir mais centróides que pontos de treino.
+    """
+    return max(1, min(8, int(math.log2(max(n_train, 2)))))
+
+
+def new_index(
+    dim: int,
+    index_type: str = "flat",
+    metric: str = "l2",
+    n_train: int = 0,
+    nlist: Optional[int] = None,
+    pq_m: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 40,
+) -> faiss.Index:
+    """
+    Cria um índice vazio (ainda não treinado, no caso do IVF).
+
+    Parâmetros
+    ----------
+    dim : int
+        Dimensão dos embeddings.
+    index_type : str
+        Um de INDEX_TYPES.
+    metric : str
+        "l2" (distância euclidiana) ou "cosine" (produto interno; os vetores
+        devem ser normalizados antes de indexar/buscar, ver `normalize`).
+    n_train : int
+        Quantidade de vetores disponíveis para treino (define nlist/nbits automáticos).
+    nlist : int, opcional
+        Listas do IVF. Se None, calculado a partir de n_train.
+    pq_m : int
+        Subquantizadores do PQ/IVF-PQ (ajustado para dividir `dim`).
+    hnsw_m, ef_construction : int
+        Parâmetros de construção do grafo HNSW.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Métrica inválida: {metric} (use uma de {tuple(METRICS)})")
+    faiss_metric = METRICS[metric]
+
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlat(dim, faiss_metric))
+
+    if index_type in SCALAR_QUANTIZERS:
+        return faiss.IndexIDMap2(
+            faiss.IndexScalarQuantizer(dim, SCALAR_QUANTIZERS[index_type], faiss_metric)
+        )
+
+    if index_type == "pq":
+        m = _pq_subquantizers(dim, pq_m)
+        return faiss.IndexIDMap2(faiss.IndexPQ(dim, m, _pq_nbits(n_train), faiss_metric))
+
+    if index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, hnsw_m, faiss_metric)
+        hnsw.hnsw.efConstruction = ef_construction
+        return faiss.IndexIDMap2(hnsw)
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or _auto_nlist(n_train)
+        quantizer = faiss.IndexFlat(dim, faiss_metric)
+        if index_type == "ivf_flat":
+            return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+        m = _pq_subquantizers(dim, pq_m)
+        return faiss.IndexIVFPQ(
+            quantizer, dim, nlist, m, _pq_nbits(n_train), faiss_metric
+        )
+
+    raise ValueError(f"Tipo de índice inválido: {index_type} (use um de {INDEX_TYPES})")
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Converte para float32 contíguo e normaliza cada linha (norma L2 = 1).
+    """
+    embeddings = np.array(embeddings, dtype="float32", order="C", ndmin=2)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def build_index(
+    embeddings: np.ndarray,
+    ids: np.ndarray,
+    index_type: str = "flat",
+    metric: str = "l2",
+    **options,
+) -> faiss.Index:
+    """
+    Cria, treina (se necessário) e popula um índice com os embeddings e IDs dados.
+    No modo "cosine" os embeddings devem vir normalizados.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    ids = np.asarray(ids, dtype="int64")
+
+    index = new_index(
+        embeddings.shape[1], index_type, metric, n_train=len(embeddings), **options
+    )
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add_with_ids(embeddings, ids)
+    return index
+
+
+def exact_scores(query: np.ndarray, vectors: np.ndarray, metric: str = "l2") -> np.ndarray:
+    """
+    Scores em precisão total de uma consulta contra `vectors`, na convenção do
+    FAISS: produto interno ("cosine") ou distância L2 ao quadrado ("l2").
+    """
+    vectors = np.asarray(vectors, dtype="float32")
+    if metric == "cosine":
+        return vectors @ query
+    diff = vectors - query
+    return np.einsum("ij,ij->i", diff, diff)
+
+
+def rerank(
+    queries: np.ndarray, candidates: np.ndarray, vectors: np.ndarray, metric: str = "l2"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reordena candidatos de um índice comprimido com os vetores originais.
+
+    `candidates` traz posições em `vectors` (-1 = vazio, como no FAISS); só as
+    linhas candidatas são lidas, então `vectors` pode ser um np.memmap.
+    Retorna (scores, posições) no mesmo formato de `index.search`.
+    """
+    fill = -np.inf if metric == "cosine" else np.inf
+    scores = np.full(candidates.shape, fill, dtype="float32")
+    rows = np.full(candidates.shape, -1, dtype="int64")
+
+    for q, (query, cand) in enumerate(zip(queries, candidates)):
+        # Ordenadas: leitura sequencial das linhas quando `vectors` está em disco
+        cand = np.sort(cand[cand >= 0])
+        if not len(cand):
+            continue
+        s = exact_scores(query, vectors[cand], metric)
+        order = np.argsort(-s if metric == "cosine" else s, kind="stable")
+        scores[q, : len(cand)] = s[order]
+        rows[q, : len(cand)] = cand[order]
+    return scores, rows
+
+
+def score_ids(
+    index: faiss.Index, query: np.ndarray, ids: np.ndarray, metric: str = "l2"
+) -> np.ndarray:
+    """
+    Scores de uma consulta (1 x d) contra IDs específicos do índice, na ordem de `ids`.
+
+    Índices com IndexIDMap2 reconstroem os vetores; IVF busca restrito aos IDs
+    (todas as listas). IDs ausentes recebem o pior score possível.
+    """
+    ids = np.asarray(ids, dtype="int64")
+    if isinstance(index, faiss.IndexIDMap2):
+        vectors = np.vstack([index.reconstruct(int(i)) for i in ids])
+        return exact_scores(query[0], vectors, metric)
+
+    ivf = faiss.extract_index_ivf(index)
+    params = faiss.SearchParametersIVF(sel=faiss.IDSelectorBatch(ids), nprobe=ivf.nlist)
+    scores, found = index.search(query, len(ids), params=params)
+    by_id = dict(zip(found[0].tolist(), scores[0].tolist()))
+    worst = -np.inf if metric == "cosine" else np.inf
+    return np.array([by_id.get(int(i), worst) for i in ids], dtype="float32")
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """
+    Tamanho serializado do índice (aproximação do uso de memória).
+    """
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def read_index(path: str, mmap: bool = False) -> faiss.Index:
+    """
+    Lê um índice salvo. Com `mmap=True` os vetores/códigos ficam no arquivo
+    mapeado (IO_FLAG_MMAP_IFC, faiss >= 1.11), sem cópia para a heap: processos
+    que abrem o mesmo arquivo compartilham as páginas. O índice é somente leitura.
+
+    IO_FLAG_MMAP sozinho só mapeia as listas invertidas do IVF; flat/SQ/PQ/HNSW
+    seriam lidos inteiros para a memória de cada processo.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        print("Aviso: faiss sem IO_FLAG_MMAP_IFC (>= 1.11); índice carregado na memória.")
+        return faiss.read_index(path)
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+
+
+def _inner(index: faiss.Index) -> faiss.Index:
+    """
+    Índice interno de um IndexIDMap/IndexIDMap2 (ou o próprio índice).
+    """
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def configure_search(
+    index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+) -> None:
+    """
+    Ajusta os parâmetros de busca (nprobe no IVF, efSearch no HNSW).
+    Parâmetros que não se aplicam ao tipo de índice são ignorados.
+    """
+    if nprobe is not None:
+        try:
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = min(nprobe, ivf.nlist)
+        except RuntimeError:
+            pass
+
+    inner = _inner(index)
+    if ef_search is not None and isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """
+    HNSW não permite remover vetores; os demais tipos aceitam `remove_ids`.
+    """
+    return not isinstance(_inner(index), faiss.IndexHNSW)
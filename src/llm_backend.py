@@ -0,0 +1,272 @@
+"""
+llm_backend.py
+Backends de LLM plugáveis por trás de LLMModel / init_gemini.
+
+Todo backend devolve um objeto com a mesma interface usada no projeto
+(a do `genai.GenerativeModel`):
+- `model_name`
+- `generate_content(prompt, generation_config=None, stream=False)`
+- `await generate_content_async(prompt, generation_config=None, stream=False)`
+cujas respostas têm `.text` e, em streaming, são iteráveis em pedaços com `.text`.
+
+Backends disponíveis: "gemini" (API real) e "fake" (local e determinístico,
+para testes de carga sem chave nem rede). A escolha vem do argumento `backend`
+ou da variável de ambiente LLM_BACKEND.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Vocabulário do texto simulado (o conteúdo não importa, só o volume e o formato)
+_WORDS = (
+    "welhome imóvel imóveis lead leads venda vendas painel app comissão cadastro "
+    "proprietário corretor visita anúncio região cidade bairro preço prazo contato "
+    "qualificação integração alerta resumo proposta cliente plataforma atendimento"
+).split()
+
+
+class FakeRateLimitError(Exception):
+    """
+    Erro simulado de cota (equivalente ao 429 "Resource has been exhausted" da API).
+    """
+
+    code = 429
+
+
+class FakeResponse:
+    """
+    Resposta (ou pedaço de resposta em streaming) com `.text`, como a do Gemini.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class _FakeStream:
+    """
+    Resposta em streaming: iterável (sync) e async-iterável, pedaço a pedaço.
+    """
+
+    def __init__(self, chunks: List[str], chunk_delay: float) -> None:
+        self._chunks = chunks
+        self._delay = chunk_delay
+        self.text = "".join(chunks)
+
+    def __iter__(self) -> Iterator[FakeResponse]:
+        for chunk in self._chunks:
+            time.sleep(self._delay)
+            yield FakeResponse(chunk)
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            yield FakeResponse(chunk)
+
+
+class FakeGenerativeModel:
+    """
+    LLM local e determinístico para testes de carga.
+
+    - Texto: função do (modelo, prompt, generation_config); o mesmo prompt sempre
+      gera a mesma resposta. Com `response_schema` (JSON), gera um objeto válido.
+    - Latência: tempo até o primeiro token com distribuição log-normal
+      (`latency_ms` = mediana, `latency_sigma` = dispersão) e depois
+      `tokens_per_s` tokens por segundo (1 token ~ 1 palavra).
+    - Erros: `error_rate` das chamadas falha com FakeRateLimitError; `max_rps`
+      (> 0) simula a cota por segundo da API.
+
+    As sorteadas (latência e erros) usam um gerador com `seed`, então uma mesma
+    sequência de chamadas se repete entre execuções.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "models/fake",
+        latency_ms: float = 300.0,
+        latency_sigma: float = 0.3,
+        tokens_per_s: float = 80.0,
+        output_tokens: int = 60,
+        error_rate: float = 0.0,
+        max_rps: float = 0.0,
+        seed: int = 42,
+    ) -> None:
+        # Mesmo formato do nome no GenerativeModel ("models/...")
+        if not model_name.startswith("models/"):
+            model_name = f"models/{model_name}"
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_s = tokens_per_s
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._window_calls = 0
+
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, model_name: str = "models/fake") -> "FakeGenerativeModel":
+        """
+        Configuração pelas variáveis FAKE_LLM_* (latência, vazão, erros, semente).
+        """
+        env = os.environ.get
+        return cls(
+            model_name=model_name,
+            latency_ms=float(env("FAKE_LLM_LATENCY_MS", 300)),
+            latency_sigma=float(env("FAKE_LLM_LATENCY_SIGMA", 0.3)),
+            tokens_per_s=float(env("FAKE_LLM_TOKENS_PER_S", 80)),
+            output_tokens=int(env("FAKE_LLM_OUTPUT_TOKENS", 60)),
+            error_rate=float(env("FAKE_LLM_ERROR_RATE", 0)),
+            max_rps=float(env("FAKE_LLM_MAX_RPS", 0)),
+            seed=int(env("FAKE_LLM_SEED", 42)),
+        )
+
+    # ----------------------------
+    # Interface do GenerativeModel
+    # ----------------------------
+    def generate_content(
+        self, prompt: str, generation_config: Optional[Dict] = None, stream: bool = False
+    ):
+        first_token_s, chunks, chunk_delay = self._plan(prompt, generation_config)
+        time.sleep(first_token_s)
+        if stream:
+            return _FakeStream(chunks, chunk_delay)
+        time.sleep(chunk_delay * len(chunks))
+        return FakeResponse("".join(chunks))
+
+    async def generate_content_async(
+        self, prompt: str, generation_config: Optional[Dict] = None, stream: bool = False
+    ):
+        first_token_s, chunks, chunk_delay = self._plan(prompt, generation_config)
+        await asyncio.sleep(first_token_s)
+        if stream:
+            return _FakeStream(chunks, chunk_delay)
+        await asyncio.sleep(chunk_delay * len(chunks))
+        return FakeResponse("".join(chunks))
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "errors": self.errors}
+
+    # ----------------------------
+    # Internos
+    # ----------------------------
+    def _plan(self, prompt: str, generation_config: Optional[Dict]):
+        """
+        Sorteia latência/erro da chamada e monta o texto (em pedaços) da resposta.
+        """
+        with self._lock:
+            self.calls += 1
+            first_token_s = self._rng.lognormvariate(0.0, self.latency_sigma) * self.latency_ms / 1000
+            failed = self._rng.random() < self.error_rate or self._over_quota()
+            if failed:
+                self.errors += 1
+        if failed:
+            raise FakeRateLimitError("429 Resource has been exhausted (simulado)")
+
+        text = self._text(prompt, generation_config)
+        # Pedaços de ~8 palavras, como os blocos que a API envia em streaming
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+        chunks[-1] = chunks[-1].rstrip()
+        tokens_per_chunk = len(words) / len(chunks)
+        chunk_delay = tokens_per_chunk / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        return first_token_s, chunks, chunk_delay
+
+    def _over_quota(self) -> bool:
+        if self.max_rps <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start = now
+            self._window_calls = 0
+        self._window_calls += 1
+        return self._window_calls > self.max_rps
+
+    def _text(self, prompt: str, generation_config: Optional[Dict]) -> str:
+        config = generation_config or {}
+        seed = hashlib.sha1(
+            json.dumps([self.model_name, prompt, config], sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        rng = random.Random(seed)
+
+        schema = config.get("response_schema")
+        if schema is not None and config.get("response_mime_type") == "application/json":
+            return json.dumps(_fake_value(schema, rng, self.output_tokens), ensure_ascii=False)
+
+        words = [rng.choice(_WORDS) for _ in range(self.output_tokens)]
+        # Uma frase por linha (scripts como o expand_faq separam por "\n")
+        lines = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        return f"[fake:{seed[:8]}] " + "\n".join(lines)
+
+
+def _fake_value(schema: Dict, rng: random.Random, tokens: int):
+    """
+    Valor determinístico que obedece a um response_schema do Gemini (subconjunto OpenAPI).
+    """
+    kind = str(schema.get("type", "STRING")).upper()
+    if kind == "OBJECT":
+        return {
+            name: _fake_value(prop, rng, tokens)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "ARRAY":
+        return [_fake_value(schema.get("items", {}), rng, max(4, tokens // 6)) for _ in range(2)]
+    if kind == "INTEGER":
+        return rng.randint(0, 100)
+    if kind == "NUMBER":
+        return round(rng.uniform(0, 100), 2)
+    if kind == "BOOLEAN":
+        return rng.random() < 0.5
+    return " ".join(rng.choice(_WORDS) for _ in range(max(2, tokens // 4))).capitalize()
+
+
+# ============================
+# Registro de backends
+# ============================
+def _gemini(api_key: Optional[str], model_name: str):
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+def _fake(api_key: Optional[str], model_name: str):
+    return FakeGenerativeModel.from_env(model_name)
+
+
+BACKENDS: Dict[str, Callable] = {"gemini": _gemini, "fake": _fake}
+
+
+def register_backend(name: str, factory: Callable) -> None:
+    """
+    Registra um backend: `factory(api_key, model_name)` devolve o modelo.
+    """
+    BACKENDS[name] = factory
+
+
+def backend_name(backend: Optional[str] = None) -> str:
+    """
+    Backend em uso: o argumento, senão LLM_BACKEND, senão "gemini".
+    """
+    return backend or os.environ.get("LLM_BACKEND", "gemini")
+
+
+def create_model(api_key: Optional[str], model_name: str, backend: Optional[str] = None):
+    """
+    Cria o modelo do backend escolhido (mesma interface do genai.GenerativeModel).
+    """
+    name = backend_name(backend)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de LLM inválido: {name} (use um de {tuple(BACKENDS)})")
+    return BACKENDS[name](api_key, model_name)
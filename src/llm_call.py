@@ -0,0 +1,169 @@
+"""
+llm_call.py
+Uma chamada ao LLM com cache exato de prompts e métricas, em um único lugar:
+consulta ao cache -> record_cache -> chamada (span) -> record_llm_call -> cache.set.
+
+Usado por LLMModel (src/LLM_model.py) e pelo chatbot (py/chatbot.py), nas versões
+síncrona/assíncrona e com/sem streaming. `model` é qualquer objeto com a interface
+do `genai.GenerativeModel` (`model_name`, `generate_content`, `generate_content_async`).
+
+Erros do backend (e `asyncio.TimeoutError`) são contados e propagados: quem chama
+decide se viram exceção ou mensagem. Resposta vazia é contada como "empty", devolvida
+como "" (ou nenhum pedaço) e não vai para o cache.
+"""
+
+import asyncio
+import contextlib
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from metrics import record_cache, record_llm_call, span
+from prompt_cache import PromptCache
+
+
+def _lookup(model_name: str, prompt: str, cache: Optional[PromptCache], config: Optional[Dict]):
+    if cache is None:
+        return None
+    cached = cache.get(model_name, prompt, config)
+    record_cache("prompt", cached is not None)
+    return cached
+
+
+def _finish(
+    model_name: str,
+    prompt: str,
+    text: str,
+    usage,
+    cache: Optional[PromptCache],
+    config: Optional[Dict],
+) -> None:
+    record_llm_call(model_name, prompt, text, "ok" if text else "empty", usage)
+    if text and cache is not None:
+        cache.set(model_name, prompt, text, config)
+
+
+def generate_text(
+    model,
+    prompt: str,
+    cache: Optional[PromptCache] = None,
+    generation_config: Optional[Dict] = None,
+) -> str:
+    """
+    Texto completo de uma chamada (ou do cache).
+    """
+    cached = _lookup(model.model_name, prompt, cache, generation_config)
+    if cached is not None:
+        return cached
+
+    try:
+        with span("llm.generate"):
+            response = model.generate_content(prompt, generation_config=generation_config)
+        # .text do Gemini levanta ValueError em respostas bloqueadas: conta como erro
+        text = (response.text if response else "") or ""
+    except Exception:
+        record_llm_call(model.model_name, prompt, outcome="error")
+        raise
+    _finish(model.model_name, prompt, text, getattr(response, "usage_metadata", None),
+            cache, generation_config)
+    return text
+
+
+async def agenerate_text(
+    model,
+    prompt: str,
+    cache: Optional[PromptCache] = None,
+    generation_config: Optional[Dict] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Versão assíncrona de `generate_text`, com limite de concorrência (semáforo)
+    e tempo máximo por chamada.
+    """
+    cached = _lookup(model.model_name, prompt, cache, generation_config)
+    if cached is not None:
+        return cached
+
+    try:
+        async with semaphore or contextlib.nullcontext():
+            with span("llm.generate"):
+                response = await asyncio.wait_for(
+                    model.generate_content_async(prompt, generation_config=generation_config),
+                    timeout,
+                )
+        text = (response.text if response else "") or ""
+    except asyncio.TimeoutError:
+        record_llm_call(model.model_name, prompt, outcome="timeout")
+        raise
+    except Exception:
+        record_llm_call(model.model_name, prompt, outcome="error")
+        raise
+    _finish(model.model_name, prompt, text, getattr(response, "usage_metadata", None),
+            cache, generation_config)
+    return text
+
+
+def stream_text(
+    model,
+    prompt: str,
+    cache: Optional[PromptCache] = None,
+    generation_config: Optional[Dict] = None,
+) -> Iterator[str]:
+    """
+    Pedaços do texto à medida que chegam (o cache devolve a resposta em um pedaço).
+    """
+    cached = _lookup(model.model_name, prompt, cache, generation_config)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    usage = None
+    try:
+        with span("llm.stream"):
+            response = model.generate_content(
+                prompt, generation_config=generation_config, stream=True
+            )
+            for chunk in response:
+                # usage_metadata completo vem no último pedaço
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+    except Exception:
+        record_llm_call(model.model_name, prompt, "".join(chunks), outcome="error")
+        raise
+    _finish(model.model_name, prompt, "".join(chunks), usage, cache, generation_config)
+
+
+async def astream_text(
+    model,
+    prompt: str,
+    cache: Optional[PromptCache] = None,
+    generation_config: Optional[Dict] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[str]:
+    """
+    Versão assíncrona de `stream_text` (o semáforo vale durante todo o stream).
+    """
+    cached = _lookup(model.model_name, prompt, cache, generation_config)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    usage = None
+    try:
+        async with semaphore or contextlib.nullcontext():
+            with span("llm.stream"):
+                response = await model.generate_content_async(
+                    prompt, generation_config=generation_config, stream=True
+                )
+                async for chunk in response:
+                    usage = getattr(chunk, "usage_metadata", None) or usage
+                    if chunk.text:
+                        chunks.append(chunk.text)
+                        yield chunk.text
+    except Exception:
+        record_llm_call(model.model_name, prompt, "".join(chunks), outcome="error")
+        raise
+    _finish(model.model_name, prompt, "".join(chunks), usage, cache, generation_config)
@@ -0,0 +1,379 @@
+"""
+metrics.py
+Instrumentação leve do caminho de uma pergunta: spans (context manager),
+histogramas e contadores em memória, exportados no formato texto do Prometheus
+e, opcionalmente, registrados em log JSON (uma linha por evento).
+
+Uso:
+    from metrics import METRICS, span
+
+    trace = METRICS.start_trace("rag", session_id=sid)
+    with span("encode", trace):
+        emb = store.embed_queries([query])  # spans internos entram no mesmo trace
+    METRICS.finish_trace(trace)             # trace.timings -> {"encode": s, "total": s}
+"""
+
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Limites (em segundos) dos buckets de latência: de 1 ms (encode/busca) a 30 s (LLM)
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# Trace e profundidade do span ativos (por thread e por tarefa asyncio)
+_current: contextvars.ContextVar = contextvars.ContextVar("rag_trace", default=(None, 0))
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """
+    Contador monotônico, um valor por combinação de labels.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = "") -> None:
+        self.name = name
+        self.help = help
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram:
+    """
+    Histograma de buckets fixos (cumulativos, como no Prometheus), por combinação de labels.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagem por bucket (+Inf no final), soma, total]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, [list(s[0]), s[1], s[2]]) for k, s in self._series.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = 'le="' + le + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Trace:
+    """
+    Tempos de uma requisição.
+
+    - `timings`: segundos por etapa (spans de primeiro nível do trace, somados
+      quando repetidos) e "total" ao finalizar;
+    - `spans`: todos os spans, na ordem de início, com "start_ms", "duration_ms"
+      e "depth" (0 = etapa; maior = chamada interna, ex.: "faiss.search" dentro de "search").
+    """
+
+    def __init__(self, name: str, **attrs) -> None:
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.timings: Dict[str, float] = {}
+        self.spans: List[Dict] = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, depth: int, error: bool = False) -> None:
+        with self._lock:
+            if depth == 0:
+                self.timings[name] = self.timings.get(name, 0.0) + duration
+            self.spans.append({
+                "span": name,
+                "start_ms": round((start - self._start) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "depth": depth,
+                **({"error": True} if error else {}),
+            })
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "ts": self.started_at,
+            **self.attrs,
+            "timings_ms": {k: round(v * 1000, 3) for k, v in self.timings.items()},
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+class JsonLogSink:
+    """
+    Grava cada evento (trace finalizado ou span avulso) como uma linha JSON.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Dict) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas do processo, com spans e traces por requisição.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._sinks: List[Callable[[Dict], None]] = []
+        self.last_trace: Optional[Trace] = None
+
+        self.span_seconds = self.histogram("rag_span_seconds", "Duração dos spans por etapa")
+        self.span_errors = self.counter("rag_span_errors_total", "Spans encerrados com exceção")
+
+    # ----------------------------
+    # Métricas
+    # ----------------------------
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, buckets)
+
+    def _get_or_create(self, cls, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrica {name} já registrada como {metric.kind}")
+            return metric
+
+    # ----------------------------
+    # Spans e traces
+    # ----------------------------
+    @contextmanager
+    def span(self, name: str, trace: Optional[Trace] = None) -> Iterator[None]:
+        """
+        Mede o bloco: alimenta `rag_span_seconds{span=name}` e o trace ativo.
+        Passar `trace` torna o span uma etapa do trace; spans abertos dentro
+        dele (em qualquer módulo) entram no mesmo trace como chamadas internas.
+        """
+        previous = _current.get()
+        parent, depth = previous
+        if trace is not None:
+            active, depth = trace, 0
+        else:
+            active = parent
+        token = _current.set((active, depth + 1))
+
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            self.span_errors.inc(span=name)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Gerador retomado em outro contexto: restaura o estado anterior
+                _current.set(previous)
+            self.span_seconds.observe(duration, span=name)
+            if active is not None:
+                active.add(name, start, duration, depth, error)
+            else:
+                self._emit({"event": "span", "span": name, "ts": time.time(),
+                            "duration_ms": round(duration * 1000, 3), **({"error": True} if error else {})})
+
+    def record(self, name: str, seconds: float, trace: Optional[Trace] = None) -> None:
+        """
+        Registra uma duração medida fora de um bloco (ex.: tempo até o primeiro token).
+        """
+        self.span_seconds.observe(seconds, span=name)
+        if trace is not None:
+            trace.add(name, time.perf_counter() - seconds, seconds, 0)
+
+    def start_trace(self, name: str, **attrs) -> Trace:
+        return Trace(name, **attrs)
+
+    def finish_trace(self, trace: Trace, **attrs) -> Trace:
+        """
+        Fecha o trace ("total"), guarda como `last_trace` e envia aos sinks.
+        """
+        total = time.perf_counter() - trace._start
+        trace.timings["total"] = total
+        trace.attrs.update(attrs)
+        self.span_seconds.observe(total, span=trace.name)
+        self.last_trace = trace
+        self._emit({"event": "trace", **trace.to_dict()})
+        return trace
+
+    # ----------------------------
+    # Exportação
+    # ----------------------------
+    def add_sink(self, sink: Callable[[Dict], None]) -> None:
+        self._sinks.append(sink)
+
+    def _emit(self, event: Dict) -> None:
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                print(f"Aviso: falha ao registrar métrica ({e}).")
+
+    def to_prometheus(self) -> str:
+        """
+        Todas as métricas no formato texto de exposição do Prometheus (0.0.4).
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Grava o texto do Prometheus em disco (ex.: textfile collector do node_exporter).
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = "0.0.0.0"):
+        """
+        Expõe GET /metrics em uma thread daemon; retorna o servidor.
+        """
+        # Importado aqui: http.server (e o pacote email) pesam no tempo de inicialização
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Registro padrão do processo
+METRICS = MetricsRegistry()
+
+CACHE_REQUESTS = METRICS.counter(
+    "rag_cache_requests_total", "Consultas aos caches (prompt, semantic, cross_encoder) por resultado"
+)
+LLM_REQUESTS = METRICS.counter("llm_requests_total", "Chamadas ao LLM por modelo e resultado")
+LLM_TOKENS = METRICS.counter(
+    "llm_tokens_total", "Tokens do LLM por modelo e tipo (estimados por palavras sem usage_metadata)"
+)
+
+
+def span(name: str, trace: Optional[Trace] = None):
+    """
+    Atalho para `METRICS.span`.
+    """
+    return METRICS.span(name, trace)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_call(
+    model: str, prompt: str, text: str = "", outcome: str = "ok", usage=None
+) -> None:
+    """
+    Conta a chamada e os tokens. Com `usage` (usage_metadata do Gemini) usa os
+    números da API; sem ele, estima 1 token por palavra.
+    """
+    LLM_REQUESTS.inc(model=model, outcome=outcome)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    LLM_TOKENS.inc(prompt_tokens if prompt_tokens is not None else len(prompt.split()),
+                   model=model, kind="prompt")
+    LLM_TOKENS.inc(output_tokens if output_tokens is not None else len(text.split()),
+                   model=model, kind="output")
@@ -0,0 +1,152 @@
+"""
+prompt_cache.py
+Cache exato de prompts do LLM: a mesma combinação (modelo, prompt normalizado,
+parâmetros de geração) nunca volta à rede. Camadas plugáveis: memória (LRU)
+e SQLite (sobrevive a reinícios).
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normaliza espaços (indentação de f-strings, quebras de linha repetidas).
+    """
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def make_key(model_name: str, prompt: str, params: Optional[Dict] = None) -> str:
+    """
+    Chave do cache para (modelo, prompt normalizado, parâmetros de geração).
+    """
+    payload = json.dumps(
+        [model_name, normalize_prompt(prompt), params or {}],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Camada em memória com despejo LRU.
+    """
+
+    def __init__(self, max_entries: int = 512) -> None:
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SQLiteCache:
+    """
+    Camada persistente em SQLite (uma tabela chave -> resposta).
+    """
+
+    def __init__(self, db_path: str) -> None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prompt_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM prompt_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache (key, value, created) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class PromptCache:
+    """
+    Cache em camadas: consulta da mais rápida para a mais lenta e promove
+    acertos das camadas inferiores para as superiores.
+
+    Qualquer objeto com `get(key)` e `set(key, value)` pode ser uma camada.
+    """
+
+    def __init__(self, *tiers) -> None:
+        self.tiers = list(tiers) or [LRUCache()]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_name: str, prompt: str, params: Optional[Dict] = None) -> Optional[str]:
+        key = make_key(model_name, prompt, params)
+        for pos, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for upper in self.tiers[:pos]:
+                    upper.set(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(
+        self, model_name: str, prompt: str, value: str, params: Optional[Dict] = None
+    ) -> None:
+        key = make_key(model_name, prompt, params)
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def default_prompt_cache(
+    db_path: Optional[str] = os.path.join("base", "prompt_cache.db"), max_entries: int = 512
+) -> PromptCache:
+    """
+    Memória (LRU) + SQLite, ou só memória quando `db_path` é None.
+    """
+    tiers = [LRUCache(max_entries)]
+    if db_path:
+        tiers.append(SQLiteCache(db_path))
+    return PromptCache(*tiers)
@@ -0,0 +1,213 @@
+"""
+rag_pipeline.py
+Caminho de uma pergunta no Welhome Assistant, independente da interface:
+encode -> busca (FAISS/BM25) -> cache semântico -> prompt -> Gemini -> histórico.
+
+Usado pelo app Streamlit e pelo teste de carga (app/load_test.py), que montam o
+pipeline com `build_pipeline` e assim medem exatamente o mesmo código e configuração.
+"""
+
+import os
+import time
+from typing import Dict, Iterator, Optional
+
+from metrics import METRICS, record_cache, span
+from rag_store import VectorStore
+from reranker import CrossEncoderReranker
+from semantic_cache import SemanticCache
+
+NO_CONTEXT = "Nenhum trecho relevante do FAQ."
+
+# Similaridade (cosseno) mínima para um trecho do FAQ entrar no prompt
+SCORE_THRESHOLD = 0.3
+
+# Similaridade a partir da qual a resposta do FAQ é exibida direto, sem o Gemini
+DIRECT_ANSWER_SCORE = 0.85
+
+# Trechos enviados ao Gemini (o cross-encoder escolhe os melhores entre os candidatos)
+CONTEXT_PASSAGES = 2
+
+# Similaridade mínima para reaproveitar uma resposta do cache semântico
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_PATH = os.path.join("base", "semantic_cache")
+
+
+def build_prompt(query: str, context: str) -> str:
+    """
+    Prompt enviado ao Gemini com os trechos recuperados do FAQ.
+    """
+    return f"""
+    Você é um assistente da Welhome.
+    Pergunta do usuário: {query}
+    Contexto (FAQ + histórico): {context}
+    Responda de forma clara, breve e útil.
+    """
+
+
+class RAGPipeline:
+    """
+    Responde uma pergunta e registra o tempo de cada etapa.
+
+    Etapas em `result["timings"]` (segundos): "encode", "search", "cache",
+    "prompt", "ttft" (primeiro pedaço do LLM), "generate", "history" e "total".
+    `result["source"]` indica de onde veio a resposta: "faq" (match direto,
+    sem LLM), "cache" (cache semântico), "llm" ou "error". Em "error" (falha
+    ou resposta vazia do LLM, mesmo depois de parte do texto ter sido enviada)
+    `result["error"]` traz o motivo e a resposta não vai para o cache nem
+    para o histórico.
+
+    Cada pergunta é um trace de `metrics` (`result["trace"]`): as etapas alimentam
+    o histograma `rag_span_seconds` e os spans internos (encoder, FAISS, BM25,
+    cross-encoder, LLM) aparecem no trace como chamadas aninhadas.
+    """
+
+    def __init__(
+        self,
+        store: VectorStore,
+        response_cache: Optional[SemanticCache] = None,
+        context_passages: int = 2,
+    ) -> None:
+        self.store = store
+        self.response_cache = response_cache
+        self.context_passages = context_passages
+
+    def stream_answer(
+        self, query: str, session_id: Optional[str] = None, result: Optional[Dict] = None
+    ) -> Iterator[str]:
+        """
+        Gera a resposta em pedaços (para st.write_stream) e, ao final, preenche
+        `result` com "resposta", "source", "hit" e "timings". Interações bem
+        sucedidas são gravadas no histórico antes do último retorno.
+        """
+        result = {} if result is None else result
+        trace = METRICS.start_trace("rag_request", session_id=session_id)
+
+        # Recuperação (encode + busca)
+        hit = VectorStore.NO_MATCH
+        if self.store.index is not None:
+            with span("encode", trace):
+                emb = self.store.embed_queries([query])
+
+            with span("search", trace):
+                hit = self.store.rag_answer(query, top_k=self.context_passages, query_embedding=emb)
+
+        # Contexto para o LLM (trechos pouco similares já foram descartados)
+        context = "\n".join(m["answer"] for m in hit["matches"]) or NO_CONTEXT
+
+        resposta = None
+        status: Dict = {}
+        if hit["direct"]:
+            # Pergunta praticamente idêntica a uma do FAQ: dispensa o Gemini
+            resposta, source = hit["answer"], "faq"
+            yield resposta
+        else:
+            if self.response_cache is not None:
+                # Pergunta equivalente com o mesmo contexto já respondida?
+                with span("cache", trace):
+                    resposta = self.response_cache.get(query, context)
+                record_cache("semantic", resposta is not None)
+
+            if resposta is not None:
+                source = "cache"
+                yield resposta
+            else:
+                with span("prompt", trace):
+                    prompt = build_prompt(query, context)
+
+                t = time.perf_counter()
+                chunks = []
+                with span("generate", trace):
+                    for chunk in self.store.llm.generate_stream(prompt, status=status):
+                        if not chunks:
+                            METRICS.record("ttft", time.perf_counter() - t, trace)
+                        chunks.append(chunk)
+                        yield chunk
+
+                resposta = "".join(chunks)
+                # A falha vem em `status`, não no texto (pode haver resposta parcial)
+                source = "error" if status.get("error") else "llm"
+
+                # Só respostas válidas vão para o cache
+                if source == "llm" and self.response_cache is not None:
+                    self.response_cache.put(query, context, resposta)
+
+        # Histórico (respostas com erro não são gravadas)
+        if source != "error":
+            with span("history", trace):
+                self.store.add_history(query, resposta, session_id=session_id)
+
+        METRICS.finish_trace(trace, source=source, direct=hit["direct"])
+        result.update({
+            "resposta": resposta,
+            "source": source,
+            "hit": hit,
+            "timings": trace.timings,
+            "trace": trace.to_dict(),
+        })
+        if source == "error":
+            result["error"] = status["error"]
+
+    def answer(self, query: str, session_id: Optional[str] = None) -> Dict:
+        """
+        Versão não-streaming de `stream_answer`; retorna o `result` completo.
+        """
+        result: Dict = {}
+        for _ in self.stream_answer(query, session_id, result):
+            pass
+        return result
+
+
+def build_pipeline(
+    api_key: Optional[str],
+    faq_path: Optional[str] = None,
+    search_mode: str = "hybrid",
+    direct_threshold: float = DIRECT_ANSWER_SCORE,
+    context_passages: int = CONTEXT_PASSAGES,
+    rerank: bool = True,
+    semantic_cache: bool = True,
+    semantic_cache_path: Optional[str] = SEMANTIC_CACHE_PATH,
+    **store_kwargs,
+) -> RAGPipeline:
+    """
+    Monta store + cache semântico + pipeline com a configuração do app.
+
+    Parâmetros
+    ----------
+    api_key : chave do Gemini.
+    faq_path : FAQ indexado (ignorado se None ou se o arquivo não existir; nesse
+        caso `pipeline.store.index` fica None).
+    search_mode, direct_threshold, context_passages : padrões do app.
+    rerank : liga o cross-encoder.
+    semantic_cache : liga o cache semântico de respostas.
+    semantic_cache_path : onde o cache semântico é salvo (None = só em memória).
+    store_kwargs : repassados ao VectorStore (ex.: history_db, history_index, llm_backend).
+
+    Retorno
+    -------
+    RAGPipeline pronto para `stream_answer`/`answer`.
+    """
+    store = VectorStore(
+        api_key,
+        metric="cosine",
+        score_threshold=SCORE_THRESHOLD,
+        dedupe_answers=True,
+        direct_threshold=direct_threshold,
+        mmap=True,  # workers na mesma máquina compartilham índice e embeddings
+        search_mode=search_mode,  # "hybrid": BM25 + FAISS (bairros, valores e termos exatos)
+        reranker=CrossEncoderReranker(max_candidates=50, max_latency_ms=300) if rerank else None,
+        **store_kwargs,
+    )
+    # Pesos do encoder e do cross-encoder carregam em segundo plano enquanto o
+    # índice é montado (com o índice do FAQ em cache, ninguém espera o torch)
+    store.encoder.warmup()
+    if store.reranker is not None:
+        store.reranker.warmup()
+    if faq_path and os.path.exists(faq_path):
+        store.load_faq_from_json(faq_path)
+
+    response_cache = None
+    if semantic_cache:
+        response_cache = SemanticCache(
+            store.encoder, threshold=SEMANTIC_CACHE_THRESHOLD, path=semantic_cache_path
+        )
+    return RAGPipeline(store, response_cache, context_passages=context_passages)
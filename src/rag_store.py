@@ -5,11 +5,84 @@ e histórico de interações usando SentenceTransformers.
 
 import os
 import json
+import hashlib
+import threading
 import faiss
 import numpy as np
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+from bm25 import BM25Index, reciprocal_rank_fusion
+from embeddings import get_encoder
+from history_store import HistoryStore
+from index_factory import (
+    INDEX_TYPES,
+    METRICS,
+    build_index,
+    configure_search,
+    exact_scores,
+    normalize,
+    read_index,
+    rerank,
+    score_ids,
+    supports_removal,
+)
 from LLM_model import LLMModel
+from metrics import span
+from prompt_cache import PromptCache
+from reranker import CrossEncoderReranker
+
+
+SEARCH_MODES = ("dense", "hybrid", "prefilter")
+
+
+def _entry_id(text: str) -> int:
+    """
+    ID estável (int64 positivo) derivado do hash do conteúdo de uma entrada.
+    """
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+class _ReadWriteLock:
+    """
+    Lock leitores/escritor: várias buscas em paralelo, (re)carga do índice exclusiva.
+    Escritores pendentes têm prioridade para não ficarem famintos sob tráfego de leitura.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
 
 
 class VectorStore:
@@ -18,18 +91,148 @@ class VectorStore:
     - FAISS para busca vetorial
     - SentenceTransformers para embeddings
     - LLM Gemini 2.0 Pro para geração de respostas
+
+    Com `dedupe_answers=True` cada variação de pergunta vira um vetor, mas a
+    busca devolve respostas distintas (guardadas uma única vez).
+
+    Uma mesma instância pode ser compartilhada entre threads (ex.: sessões do
+    Streamlit): `search` usa um lock de leitura e a (re)carga do FAQ um de escrita.
+
+    Com `mmap=True` (e `cache_dir`) o índice é aberto do cache sem cópia para a
+    heap (IO_FLAG_MMAP_IFC, faiss >= 1.11): vetores e códigos ficam no arquivo
+    mapeado e vários processos na mesma máquina compartilham as mesmas páginas
+    via page cache. Nos índices comprimidos/aproximados a matriz float32 (.npy)
+    também é mapeada, para scores exatos; no "flat" ela não é mantida.
+
+    Índices comprimidos ("sq_fp16", "sq8", "pq") reduzem a memória do índice; com
+    `rerank_factor > 0` a busca traz k·fator candidatos e os reordena com os
+    vetores float32 do .npy (mapeado do cache: só as linhas candidatas são lidas).
+
+    `search_mode` escolhe a recuperação: "dense" (só FAISS), "hybrid" (FAISS + BM25
+    fundidos por RRF) ou "prefilter" (BM25 seleciona os candidatos e só eles
+    recebem score vetorial). Os scores devolvidos são sempre os da métrica vetorial
+    e `score_threshold` vale para todos os modos; no "hybrid" só os primeiros
+    acertos do BM25 com score alto (`LEXICAL_BYPASS`, `LEXICAL_MIN_SCORE`) passam
+    mesmo abaixo dele.
+
+    Com um `reranker` (cross-encoder), a busca traz até `reranker.max_candidates`
+    candidatos e a ordem final é a do cross-encoder, dentro do orçamento dele.
     """
 
-    def __init__(self, api_key: str, embed_model: str = "all-MiniLM-L6-v2") -> None:
-        self.llm = LLMModel(api_key, model_name="gemini-2.0-pro")
-        self.encoder = SentenceTransformer(embed_model)
+    # Candidatos buscados por resultado pedido quando as respostas são deduplicadas
+    ANSWER_OVERFETCH = 10
+
+    # Constante do RRF e candidatos lexicais avaliados no modo "prefilter"
+    RRF_K = 60
+    PREFILTER_CANDIDATES = 200
+
+    # Modo "hybrid": só os LEXICAL_BYPASS primeiros do BM25, e com score BM25 de pelo
+    # menos LEXICAL_MIN_SCORE, dispensam o limite vetorial (termo exato e raro, ex.:
+    # "CRM", "plano"); um termo comum em comum ("painel", "imóveis") não basta
+    LEXICAL_BYPASS = 2
+    LEXICAL_MIN_SCORE = 3.0
+
+    # Resultado de rag_answer quando nenhuma pergunta do FAQ passa no limite
+    NO_MATCH = {"question": None, "answer": None, "score": None, "direct": False, "matches": []}
 
-        # FAISS
+    def __init__(
+        self,
+        api_key: str,
+        embed_model: str = "all-MiniLM-L6-v2",
+        cache_dir: Optional[str] = os.path.join("base", "faq_cache"),
+        device: Optional[str] = None,
+        index_type: str = "flat",
+        nprobe: int = 8,
+        ef_search: int = 64,
+        index_options: Optional[Dict[str, int]] = None,
+        metric: str = "l2",
+        score_threshold: Optional[float] = None,
+        dedupe_answers: bool = False,
+        prompt_cache: Optional[PromptCache] = None,
+        history_db: Optional[str] = os.path.join("models", "leads.db"),
+        history_index: Optional[str] = os.path.join("base", "history.faiss"),
+        direct_threshold: Optional[float] = None,
+        mmap: bool = False,
+        rerank_factor: int = 0,
+        search_mode: str = "dense",
+        reranker: Optional[CrossEncoderReranker] = None,
+        llm_backend: Optional[str] = None,
+    ) -> None:
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Tipo de índice inválido: {index_type} (use um de {INDEX_TYPES})")
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Modo de busca inválido: {search_mode} (use um de {SEARCH_MODES})")
+        if metric not in METRICS:
+            raise ValueError(f"Métrica inválida: {metric} (use uma de {tuple(METRICS)})")
+
+        self.llm = LLMModel(
+            api_key,
+            embed_model=embed_model,
+            device=device,
+            cache=prompt_cache,
+            backend=llm_backend,
+        )
+        self.embed_model = embed_model
+
+        # Mesmo encoder usado pelo LLMModel (uma cópia do modelo por processo)
+        self.encoder = get_encoder(embed_model, device)
+
+        # FAISS ("flat" = busca exata; "ivf_flat", "ivf_pq", "hnsw" = aproximada)
         self.index = None
-        self.texts: List[str] = []
+        self.entries: Dict[int, str] = {}
+
+        # Tabela de respostas (cada resposta guardada uma vez) e id da entrada -> id da resposta.
+        # Com dedupe_answers=True só a pergunta é indexada e a busca devolve respostas distintas.
+        self.answers: List[str] = []
+        self.answer_ids: Dict[int, int] = {}
+
+        # Mesmo esquema para as perguntas: rag_answer devolve pergunta e resposta
+        # direto dessas tabelas, sem reinterpretar o texto "Q:/A:"
+        self.questions: List[str] = []
+        self.question_ids: Dict[int, int] = {}
+        self.dedupe_answers = dedupe_answers
+        self.index_type = index_type
+        self.index_options = dict(index_options or {})
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+        # "l2": score = distância (menor é melhor)
+        # "cosine": embeddings normalizados + produto interno, score = similaridade
+        self.metric = metric
+        self.score_threshold = score_threshold
+
+        # Score a partir do qual rag_answer marca a resposta do FAQ como direta
+        # (pode ser exibida sem reescrita pelo LLM); None desativa o atalho
+        self.direct_threshold = direct_threshold
+
+        # Cache em disco do índice do FAQ (None desativa)
+        self.cache_dir = cache_dir
+
+        # Índice/embeddings mapeados do cache (somente leitura, compartilhados entre processos).
+        # `embeddings` segue a ordem de `entries` e só é mantido no modo mmap ou com re-ranking.
+        self.mmap = mmap
+        self.rerank_factor = rerank_factor
+        self.embeddings: Optional[np.ndarray] = None
+        self._row_ids = np.empty(0, dtype="int64")
+        self._rows: Dict[int, int] = {}
+        self._mapped_path: Optional[str] = None
+
+        # Índice lexical (BM25 sobre pergunta + resposta), construído junto com o FAISS
+        # quando o modo de busca usa termos exatos
+        self.search_mode = search_mode
+        self.lexical: Optional[BM25Index] = None
+
+        # Re-ranking opcional por cross-encoder (orçamento e cache ficam no reranker)
+        self.reranker = reranker
+        self._lock = _ReadWriteLock()
 
-        # Histórico
-        self.hist_items: List[Dict[str, str]] = []
+        # Histórico persistente (SQLite + FAISS); history_db=None mantém só em memória
+        self.history = HistoryStore(
+            self.encoder,
+            db_path=history_db or ":memory:",
+            index_path=history_index if history_db else None,
+            legacy_json=os.path.join("base", "history.json") if history_db else None,
+        )
 
     # ----------------------------
     # FAQ
@@ -37,51 +240,703 @@ class VectorStore:
     def load_faq_from_json(self, json_path: str) -> None:
         """
         Carrega um FAQ em JSON e indexa no FAISS.
+
+        Se existir um índice em cache para o mesmo conteúdo do arquivo e o
+        mesmo modelo de embeddings, ele é lido do disco sem recalcular embeddings.
+        """
+        raw = self._read_faq_file(json_path)
+
+        cache_key = self._cache_key(raw)
+        with self._lock.write():
+            if self._load_cached_index(cache_key):
+                return
+
+        entries, tables = self._parse_faq_entries(raw)
+        index, embeddings = self._build_index(entries)
+
+        # Troca o índice de uma vez: buscas em andamento terminam no índice antigo
+        with self._lock.write():
+            self._set_index(index, embeddings, entries)
+            self._set_tables(*tables)
+            self._build_lexical()
+            self._save_cached_index(cache_key)
+
+    def sync_faq(self, json_path: str) -> Dict[str, int]:
+        """
+        Atualiza o índice de forma incremental a partir de um FAQ em JSON.
+
+        Compara o hash de cada entrada com as já indexadas: apenas entradas
+        novas ou alteradas são codificadas, e as que saíram do arquivo têm seus
+        vetores removidos do índice (uma entrada alterada conta como removida + adicionada).
+
+        Retorno
+        -------
+        Dict com as contagens "added", "removed" e "unchanged" ("added" conta só
+        entradas codificadas agora; um índice lido do cache conta como "unchanged").
+        """
+        raw = self._read_faq_file(json_path)
+        cache_key = self._cache_key(raw)
+
+        with self._lock.write():
+            return self._sync_entries(raw, cache_key)
+
+    def _sync_entries(self, raw: bytes, cache_key: str) -> Dict[str, int]:
+        if self.index is None and self._load_cached_index(cache_key):
+            # Nada foi codificado: o índice em cache já tem o conteúdo do arquivo
+            return {"added": 0, "removed": 0, "unchanged": len(self.entries)}
+
+        new_entries, tables = self._parse_faq_entries(raw)
+        self._set_tables(*tables)
+
+        # Sem índice prévio: construção completa (IVF precisa ser treinado)
+        if self.index is None:
+            self._set_index(*self._build_index(new_entries), new_entries)
+            self._build_lexical()
+            self._save_cached_index(cache_key)
+            return {"added": len(new_entries), "removed": 0, "unchanged": 0}
+
+        # Índice mapeado é somente leitura: carrega uma cópia gravável do mesmo arquivo
+        if self._mapped_path:
+            self.index = faiss.read_index(self._mapped_path)
+            configure_search(self.index, self.nprobe, self.ef_search)
+            self._mapped_path = None
+
+        stale_ids = [i for i in self.entries if i not in new_entries]
+        added = {i: t for i, t in new_entries.items() if i not in self.entries}
+
+        if stale_ids and supports_removal(self.index):
+            self.index.remove_ids(np.array(stale_ids, dtype="int64"))
+        elif stale_ids:
+            # HNSW não remove vetores: reconstrói só com os mantidos (sem recodificar)
+            kept = [i for i in self.entries if i in new_entries]
+            vectors = np.array(
+                [self.index.reconstruct(i) for i in kept], dtype="float32"
+            ).reshape(len(kept), self.index.d)
+            self.index = build_index(
+                vectors,
+                np.array(kept, dtype="int64"),
+                self.index_type,
+                self.metric,
+                **self.index_options,
+            )
+            configure_search(self.index, self.nprobe, self.ef_search)
+
+        new_vectors: Dict[int, np.ndarray] = {}
+        if added:
+            embeddings = self._embed(list(added.values()))
+            self.index.add_with_ids(embeddings, np.array(list(added), dtype="int64"))
+            new_vectors = dict(zip(added, embeddings))
+
+        embeddings = None
+        if self.embeddings is not None:
+            # Realinha a matriz com a nova ordem das entradas (sem recodificar as mantidas)
+            embeddings = np.array(
+                [
+                    new_vectors[i] if i in new_vectors else self.embeddings[self._rows[i]]
+                    for i in new_entries
+                ],
+                dtype="float32",
+            ).reshape(len(new_entries), self.index.d)
+
+        stats = {
+            "added": len(added),
+            "removed": len(stale_ids),
+            "unchanged": len(new_entries) - len(added),
+        }
+
+        self._set_index(self.index, embeddings, new_entries)
+        self._build_lexical()
+        self._save_cached_index(cache_key)
+        return stats
+
+    @property
+    def texts(self) -> List[str]:
+        """
+        Textos indexados, na ordem do arquivo FAQ.
         """
+        return list(self.entries.values())
+
+    @staticmethod
+    def _read_faq_file(json_path: str) -> bytes:
         if not os.path.exists(json_path):
             raise FileNotFoundError(f"Arquivo FAQ não encontrado: {json_path}")
 
-        with open(json_path, "r", encoding="utf-8") as f:
-            faq_data = json.load(f)
+        with open(json_path, "rb") as f:
+            return f.read()
 
-        # Suporta chaves "pergunta"/"resposta" ou "q"/"a"
-        self.texts = [
-            f"Q: {item.get('pergunta', item.get('q'))}\nA: {item.get('resposta', item.get('a'))}"
-            for item in faq_data
-        ]
+    def _parse_faq_entries(self, raw: bytes) -> Tuple[Dict[int, str], tuple]:
+        """
+        Converte o JSON do FAQ em ({id da entrada: texto indexado}, tabelas), onde
+        tabelas = (perguntas, {id da entrada: id da pergunta},
+                   respostas, {id da entrada: id da resposta}).
+        """
+        faq_data = json.loads(raw.decode("utf-8"))
+
+        entries: Dict[int, str] = {}
+        question_ids: Dict[int, int] = {}
+        answer_ids: Dict[int, int] = {}
+        question_pos: Dict[str, int] = {}
+        answer_pos: Dict[str, int] = {}
+
+        for item in faq_data:
+            # Suporta chaves "pergunta"/"resposta" ou "q"/"a"
+            question = item.get("pergunta", item.get("q"))
+            answer = item.get("resposta", item.get("a"))
+            qa_text = f"Q: {question}\nA: {answer}"
+
+            entry_id = _entry_id(qa_text)
+            entries[entry_id] = question if self.dedupe_answers else qa_text
+            question_ids[entry_id] = question_pos.setdefault(question, len(question_pos))
+            answer_ids[entry_id] = answer_pos.setdefault(answer, len(answer_pos))
+
+        return entries, (list(question_pos), question_ids, list(answer_pos), answer_ids)
+
+    def _set_tables(
+        self,
+        questions: List[str],
+        question_ids: Dict[int, int],
+        answers: List[str],
+        answer_ids: Dict[int, int],
+    ) -> None:
+        self.questions = questions
+        self.question_ids = question_ids
+        self.answers = answers
+        self.answer_ids = answer_ids
+
+    def _build_index(self, entries: Dict[int, str]) -> Tuple[faiss.Index, np.ndarray]:
+        """
+        Codifica as entradas e constrói o índice do tipo configurado.
+        Retorna o índice e a matriz de embeddings (na ordem de `entries`).
+        """
+        embeddings = self._embed(list(entries.values()))
+        index = build_index(
+            embeddings,
+            np.array(list(entries), dtype="int64"),
+            self.index_type,
+            self.metric,
+            **self.index_options,
+        )
+        configure_search(index, self.nprobe, self.ef_search)
+        return index, embeddings
+
+    def _build_lexical(self) -> None:
+        """
+        Reconstrói o BM25 a partir das tabelas (não depende de embeddings, é barato).
+        """
+        if self.search_mode == "dense":
+            self.lexical = None
+            return
+        self.lexical = BM25Index().build({i: self._passage(i) for i in self.entries})
+
+    @property
+    def _keep_embeddings(self) -> bool:
+        # No "flat" o próprio índice já guarda os float32 exatos: o .npy seria uma segunda cópia
+        return self.rerank_factor > 0 or (self.mmap and self.index_type != "flat")
+
+    def _set_index(
+        self,
+        index: faiss.Index,
+        embeddings: Optional[np.ndarray],
+        entries: Dict[int, str],
+        mapped_path: Optional[str] = None,
+    ) -> None:
+        """
+        Troca índice, entradas e matriz de embeddings (alinhada a `entries`).
+        """
+        self.index = index
+        self.entries = entries
+        self.embeddings = embeddings if self._keep_embeddings else None
+        self._row_ids = np.array(list(entries), dtype="int64")
+        self._rows = {i: r for r, i in enumerate(entries)}
+        self._mapped_path = mapped_path
+
+    def _embed(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Embeddings float32 prontos para o índice (normalizados no modo "cosine").
+        """
+        with span("encoder.encode"):
+            embeddings = self.encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        if self.metric == "cosine":
+            return normalize(embeddings)
+        return np.ascontiguousarray(embeddings, dtype="float32")
+
+    def set_search_params(
+        self, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+    ) -> None:
+        """
+        Ajusta a troca precisão x latência da busca aproximada
+        (nprobe para IVF, efSearch para HNSW).
+        """
+        with self._lock.write():
+            if nprobe is not None:
+                self.nprobe = nprobe
+            if ef_search is not None:
+                self.ef_search = ef_search
+            if self.index is not None:
+                configure_search(self.index, self.nprobe, self.ef_search)
+
+    # ----------------------------
+    # Cache do índice
+    # ----------------------------
+    def _cache_key(self, raw: bytes) -> str:
+        """
+        Gera a chave do cache a partir do conteúdo do FAQ, do modelo de
+        embeddings e da configuração do índice.
+        """
+        config = json.dumps(
+            [
+                self.embed_model,
+                self.index_type,
+                self.metric,
+                self.dedupe_answers,
+                self.index_options,
+            ],
+            sort_keys=True,
+        )
+        h = hashlib.sha256()
+        h.update(config.encode("utf-8"))
+        h.update(b"\0")
+        h.update(raw)
+        return h.hexdigest()[:32]
+
+    def _cache_paths(self, cache_key: str) -> Tuple[str, str, str]:
+        """
+        Caminhos do índice FAISS, dos textos (mesmo formato de base/history.*)
+        e da matriz de embeddings float32 (.npy, usada no modo mmap e no re-ranking).
+        """
+        base = os.path.join(self.cache_dir, f"faq_{cache_key}")
+        return f"{base}.index", f"{base}.json", f"{base}.npy"
+
+    def _load_cached_index(self, cache_key: str) -> bool:
+        """
+        Tenta carregar o índice e os textos do cache. Retorna True em caso de sucesso.
+        """
+        if not self.cache_dir:
+            return False
+
+        index_path, texts_path, emb_path = self._cache_paths(cache_key)
+        required = [index_path, texts_path] + ([emb_path] if self._keep_embeddings else [])
+        if not all(os.path.exists(p) for p in required):
+            return False
+
+        try:
+            # Mapeado: vetores/códigos ficam no page cache, compartilhados entre processos
+            index = read_index(index_path, mmap=self.mmap)
+            embeddings = np.load(emb_path, mmap_mode="r") if self._keep_embeddings else None
+            with open(texts_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            entries = dict(zip(cached["ids"], cached["texts"]))
+            tables = (
+                cached["questions"],
+                dict(zip(cached["ids"], cached["question_ids"])),
+                cached["answers"],
+                dict(zip(cached["ids"], cached["answer_ids"])),
+            )
+        except Exception as e:
+            print(f"Aviso: cache do FAQ inválido, reindexando ({e}).")
+            return False
+
+        if index.ntotal != len(entries):
+            return False
+        if embeddings is not None and embeddings.shape[0] != len(entries):
+            return False
+
+        configure_search(index, self.nprobe, self.ef_search)
+        self._set_index(index, embeddings, entries, index_path if self.mmap else None)
+        self._set_tables(*tables)
+        self._build_lexical()
+        return True
 
-        embeddings = self.encoder.encode(self.texts, convert_to_numpy=True)
+    def _save_cached_index(self, cache_key: str) -> None:
+        """
+        Grava o índice e os textos no cache (escrita atômica via arquivo temporário).
+        """
+        if not self.cache_dir:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            index_path, texts_path, emb_path = self._cache_paths(cache_key)
 
-        dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dim)
-        self.index.add(embeddings)
+            # Temporários por processo: vários workers podem gravar o mesmo cache
+            tmp = f".{os.getpid()}.tmp"
+            faiss.write_index(self.index, index_path + tmp)
+            if self.embeddings is not None:
+                with open(emb_path + tmp, "wb") as f:
+                    np.save(f, np.ascontiguousarray(self.embeddings, dtype="float32"))
+            with open(texts_path + tmp, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "ids": list(self.entries),
+                        "texts": list(self.entries.values()),
+                        "questions": self.questions,
+                        "question_ids": [self.question_ids[i] for i in self.entries],
+                        "answers": self.answers,
+                        "answer_ids": [self.answer_ids[i] for i in self.entries],
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+
+            if self.embeddings is not None:
+                os.replace(emb_path + tmp, emb_path)
+            os.replace(texts_path + tmp, texts_path)
+            os.replace(index_path + tmp, index_path)
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o cache do FAQ ({e}).")
+            return
+
+        # Troca as cópias privadas recém-construídas pelas versões mapeadas do disco
+        if self.mmap and self._mapped_path is None:
+            self._load_cached_index(cache_key)
+        elif self.embeddings is not None and not isinstance(self.embeddings, np.memmap):
+            self.embeddings = np.load(emb_path, mmap_mode="r")
 
     # ----------------------------
     # Busca
     # ----------------------------
-    def search(self, query: str, k: int = 3) -> List[str]:
+    def search(
+        self, query: str, k: int = 3, score_threshold: Optional[float] = None
+    ) -> List[str]:
         """
         Busca no FAISS e retorna os textos mais similares.
         """
         if self.index is None:
             return ["❌ FAQ não foi carregado no índice."]
 
-        emb = self.encoder.encode([query], convert_to_numpy=True)
-        distances, indices = self.index.search(emb, k)
+        return [text for text, _ in self.search_with_scores(query, k, score_threshold)]
+
+    def search_with_scores(
+        self, query: str, k: int = 3, score_threshold: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Busca no FAISS e retorna pares (texto, score).
+
+        No modo "cosine" o score é a similaridade (maior é melhor) e resultados
+        abaixo de `score_threshold` são descartados; no modo "l2" é a distância
+        e são descartados resultados acima do limite. Sem limite na chamada,
+        vale o `score_threshold` do construtor.
+        """
+        if self.index is None:
+            raise RuntimeError("FAQ não foi carregado no índice.")
+
+        hits = self._search_embeddings(self._embed([query]), k, score_threshold, [query])[0]
+        return [(h["text"], h["score"]) for h in hits]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 3,
+        batch_size: int = 64,
+        score_threshold: Optional[float] = None,
+    ) -> List[Dict[str, list]]:
+        """
+        Busca várias consultas de uma vez: um único `encode` em lotes e uma
+        única busca matricial no FAISS.
+
+        Parâmetros
+        ----------
+        queries : List[str]
+            Consultas a buscar.
+        k : int
+            Quantidade de resultados por consulta.
+        batch_size : int
+            Tamanho do lote usado pelo encoder.
+        score_threshold : float, opcional
+            Mesmo significado de `search_with_scores`.
+
+        Retorno
+        -------
+        List[Dict]
+            Para cada consulta (mesma ordem): "texts", "distances" (scores da
+            métrica configurada) e "indices" (IDs das entradas no índice).
+        """
+        if self.index is None:
+            raise RuntimeError("FAQ não foi carregado no índice.")
+        if not queries:
+            return []
+
+        embs = self._embed(list(queries), batch_size=batch_size)
+
+        results = []
+        for hits in self._search_embeddings(embs, k, score_threshold, list(queries)):
+            results.append({
+                "texts": [h["text"] for h in hits],
+                "distances": [h["score"] for h in hits],
+                "indices": [h["id"] for h in hits],
+            })
+        return results
+
+    def rag_answer(
+        self,
+        query: str,
+        top_k: int = 3,
+        score_threshold: Optional[float] = None,
+        direct_threshold: Optional[float] = None,
+        query_embedding: Optional[np.ndarray] = None,
+    ) -> Dict:
+        """
+        Pergunta do FAQ mais próxima da consulta, com sua resposta e score.
+
+        Parâmetros
+        ----------
+        query : str
+            Pergunta do usuário.
+        top_k : int
+            Quantidade de perguntas candidatas devolvidas em "matches".
+        score_threshold : float, opcional
+            Mesmo significado de `search_with_scores`.
+        direct_threshold : float, opcional
+            Limite para "direct" (padrão: o do construtor), na mesma
+            convenção de score da métrica configurada.
+        query_embedding : np.ndarray, opcional
+            Embedding já calculado por `embed_queries` (evita recodificar).
+
+        Retorno
+        -------
+        Dict
+            "question", "answer" e "score" do melhor resultado; "direct" indica
+            que o score passou de `direct_threshold` e a resposta do FAQ pode ser
+            usada sem reescrita pelo LLM; "matches" traz os `top_k` candidatos.
+            Sem resultado, os campos do melhor resultado são None.
+        """
+        if self.index is None:
+            raise RuntimeError("FAQ não foi carregado no índice.")
+
+        if query_embedding is None:
+            query_embedding = self._embed([query])
+        hits = self._search_embeddings(query_embedding, top_k, score_threshold, [query])[0]
+        if not hits:
+            return {**self.NO_MATCH, "matches": []}
+
+        matches = [
+            {"question": h["question"], "answer": h["answer"], "score": h["score"]}
+            for h in hits
+        ]
+
+        threshold = self.direct_threshold if direct_threshold is None else direct_threshold
+        best = matches[0]
+        return {
+            **best,
+            "direct": threshold is not None and self._passes(best["score"], threshold),
+            "matches": matches,
+        }
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embeddings das consultas no formato do índice (normalizados no modo "cosine").
+        """
+        return self._embed(list(queries))
+
+    def _search_embeddings(
+        self,
+        embs: np.ndarray,
+        k: int,
+        score_threshold: Optional[float],
+        queries: Optional[List[str]] = None,
+    ) -> List[List[Dict]]:
+        """
+        Busca matricial no índice; retorna os hits de cada consulta, já filtrados,
+        como dicts "id", "score", "text", "question" e "answer".
+        Com dedupe_answers, busca mais candidatos e mantém só o melhor por resposta.
+        Nos modos "hybrid"/"prefilter" os textos das consultas alimentam o BM25.
+
+        Os textos são lidos das tabelas sob o mesmo lock de leitura da busca: um
+        `sync_faq`/`load_faq_from_json` concorrente não troca as tabelas no meio.
+        """
+        threshold = self.score_threshold if score_threshold is None else score_threshold
+        cross = self.reranker if queries is not None else None
+
+        with self._lock.read():
+            fetch_k = k * self.ANSWER_OVERFETCH if self.dedupe_answers else k
+            reranking = self.rerank_factor > 0 and self.embeddings is not None and self._rows
+            if reranking:
+                fetch_k *= self.rerank_factor
+            if cross is not None:
+                fetch_k = max(fetch_k, cross.max_candidates)
+
+            lexical = self.lexical if queries is not None else None
+
+            if lexical is not None and self.search_mode == "prefilter":
+                ranked = [
+                    self._prefilter(emb, query, fetch_k)
+                    for emb, query in zip(embs, queries)
+                ]
+            else:
+                with span("faiss.search"):
+                    scores, ids = self.index.search(embs, min(fetch_k, max(self.index.ntotal, 1)))
+                if reranking:
+                    with span("faiss.rerank"):
+                        scores, ids = self._rerank(embs, ids)
+                ranked = [
+                    [(int(i), float(s)) for s, i in zip(row_s, row_i) if i in self.entries]
+                    for row_s, row_i in zip(scores, ids)
+                ]
+
+            matched: List[set] = [set() for _ in ranked]
+            if lexical is not None and self.search_mode == "hybrid":
+                for q, (emb, query) in enumerate(zip(embs, queries)):
+                    ranked[q], matched[q] = self._fuse(emb, query, ranked[q], fetch_k)
+
+            results = []
+            for q, (row, strong) in enumerate(zip(ranked, matched)):
+                # Todos passam pelo limite vetorial, exceto os poucos acertos lexicais fortes
+                hits = [
+                    (i, score)
+                    for i, score in row
+                    if i in strong or self._passes(score, threshold)
+                ]
+                if cross is not None:
+                    hits = self._cross_rerank(cross, queries[q], hits)
+                if self.dedupe_answers:
+                    hits = self._distinct_answers(hits)
+                results.append([self._resolve(i, score) for i, score in hits[:k]])
+            return results
+
+    def _cross_rerank(
+        self, cross: CrossEncoderReranker, query: str, hits: List[Tuple[int, float]]
+    ) -> List[Tuple[int, float]]:
+        """
+        Reordena os hits pelo cross-encoder, mantendo o score vetorial de cada um.
+        Candidatos além de `max_candidates` continuam depois, na ordem original.
+        """
+        head, tail = hits[: cross.max_candidates], hits[cross.max_candidates:]
+        scores = dict(head)
+        with span("cross_encoder.rerank"):
+            order = cross.rerank(query, [(i, self._passage(i)) for i, _ in head])
+        return [(i, scores[i]) for i, _ in order] + tail
+
+    def _passage(self, entry_id: int) -> str:
+        """
+        Texto completo da entrada (pergunta + resposta), usado pelo BM25 e pelo cross-encoder.
+        """
+        return f"{self.questions[self.question_ids[entry_id]]} {self.answers[self.answer_ids[entry_id]]}"
+
+    def _dense_scores(self, emb: np.ndarray, entry_ids: List[int]) -> np.ndarray:
+        """
+        Scores vetoriais de entradas específicas (float32 exatos quando disponíveis).
+        """
+        if self.embeddings is not None:
+            rows = [self._rows[i] for i in entry_ids]
+            return exact_scores(emb, self.embeddings[rows], self.metric)
+        return score_ids(self.index, emb[None, :], np.array(entry_ids), self.metric)
+
+    def _best_first(self, hits: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        return sorted(hits, key=lambda h: -h[1] if self.metric == "cosine" else h[1])
+
+    def _prefilter(self, emb: np.ndarray, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        BM25 escolhe os candidatos; a ordem final é a do score vetorial.
+        Sem nenhum termo em comum, cai para a busca vetorial completa.
+        """
+        with span("bm25.search"):
+            candidates = [i for i, _ in self.lexical.search(query, max(k, self.PREFILTER_CANDIDATES))]
+        if not candidates:
+            with span("faiss.search"):
+                scores, ids = self.index.search(emb[None, :], min(k, max(self.index.ntotal, 1)))
+            return [(int(i), float(s)) for s, i in zip(scores[0], ids[0]) if i in self.entries]
 
-        return [self.texts[i] for i in indices[0] if i < len(self.texts)]
+        with span("faiss.score_ids"):
+            scores = self._dense_scores(emb, candidates)
+        return self._best_first(list(zip(candidates, scores.tolist())))[:k]
+
+    def _fuse(
+        self, emb: np.ndarray, query: str, dense: List[Tuple[int, float]], k: int
+    ) -> Tuple[List[Tuple[int, float]], set]:
+        """
+        Funde o ranking vetorial com o BM25 por RRF. Entradas achadas só pelo BM25
+        recebem seu score vetorial, para que todos os resultados tenham a mesma escala.
+        Retorna também os acertos lexicais fortes, que dispensam o limite vetorial.
+        """
+        with span("bm25.search"):
+            lexical = self.lexical.search(query, k)
+        lexical_ids = [i for i, _ in lexical]
+        strong = {
+            i for i, bm25 in lexical[: self.LEXICAL_BYPASS] if bm25 >= self.LEXICAL_MIN_SCORE
+        }
+        scores = dict(dense)
+        missing = [i for i in lexical_ids if i not in scores]
+        if missing:
+            scores.update(zip(missing, self._dense_scores(emb, missing).tolist()))
+
+        order = reciprocal_rank_fusion([[i for i, _ in dense], lexical_ids], self.RRF_K)
+        return [(i, scores[i]) for i in order], strong
+
+    def _rerank(self, embs: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Recalcula os scores dos candidatos com os embeddings float32 e reordena.
+        """
+        candidates = np.array(
+            [[self._rows.get(int(i), -1) for i in row] for row in ids], dtype="int64"
+        ).reshape(ids.shape)
+        scores, rows = rerank(embs, candidates, self.embeddings, self.metric)
+        return scores, np.where(rows >= 0, self._row_ids[rows], -1)
+
+    def _distinct_answers(self, hits: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        """
+        Mantém o primeiro (melhor) resultado de cada resposta.
+        """
+        seen = set()
+        distinct = []
+        for entry_id, score in hits:
+            answer_id = self.answer_ids[entry_id]
+            if answer_id not in seen:
+                seen.add(answer_id)
+                distinct.append((entry_id, score))
+        return distinct
+
+    def _resolve(self, entry_id: int, score: float) -> Dict:
+        """
+        Hit com os textos da entrada (chamado com o lock de leitura).
+        """
+        return {
+            "id": entry_id,
+            "score": score,
+            "text": self._hit_text(entry_id),
+            "question": self.questions[self.question_ids[entry_id]],
+            "answer": self.answers[self.answer_ids[entry_id]],
+        }
+
+    def _hit_text(self, entry_id: int) -> str:
+        """
+        Texto devolvido na busca: a resposta (dedupe_answers) ou o texto "Q:/A:".
+        """
+        if self.dedupe_answers:
+            return self.answers[self.answer_ids[entry_id]]
+        return self.entries[entry_id]
+
+    def _passes(self, score: float, threshold: Optional[float]) -> bool:
+        if threshold is None:
+            return True
+        if self.metric == "cosine":
+            return score >= threshold
+        return score <= threshold
 
     # ----------------------------
     # Histórico
     # ----------------------------
-    def add_history(self, query: str, resposta: str) -> None:
+    def add_history(
+        self, query: str, resposta: str, session_id: Optional[str] = None
+    ) -> None:
         """
         Adiciona uma interação ao histórico.
         """
-        self.hist_items.append({"query": query, "resposta": resposta})
+        with span("history.add"):
+            self.history.add(query, resposta, session_id=session_id)
+
+    def get_history(
+        self, offset: int = 0, limit: int = 20, session_id: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Retorna uma página do histórico (mais recentes primeiro).
+        """
+        return [
+            {"query": h["lead_id"], "resposta": h["resumo"]}
+            for h in self.history.page(offset, limit, session_id)
+        ]
 
-    def get_history(self) -> List[Dict[str, str]]:
+    def search_history(self, query: str, top_k: int = 3) -> List[Dict]:
         """
-        Retorna o histórico completo.
+        Busca semântica no histórico; retorna dicts com lead_id, resumo e score.
         """
-        return self.hist_items
+        return self.history.search(query, top_k)
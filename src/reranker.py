@@ -0,0 +1,152 @@
+"""
+reranker.py
+Re-ranking dos candidatos da busca com um cross-encoder local
+(SentenceTransformers), com orçamento de candidatos/latência e cache por par.
+"""
+
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from embeddings import load_hf_model
+from metrics import record_cache
+from prompt_cache import LRUCache
+
+# Cross-encoder multilíngue pequeno (treinado no mMARCO, inclui português)
+DEFAULT_CROSS_ENCODER = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+def _pair_key(query: str, passage: str) -> str:
+    return hashlib.sha1(f"{query}\0{passage}".encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """
+    Reordena candidatos (id, texto) pelo score do cross-encoder para a consulta.
+
+    Orçamento:
+    - `max_candidates`: no máximo esse número de candidatos é avaliado;
+    - `batch_size`: pares por chamada de `predict`;
+    - `max_latency_ms`: ao estourar, os lotes restantes não são avaliados e esses
+      candidatos ficam depois dos avaliados, na ordem original da busca.
+
+    Scores já calculados ficam em cache LRU por par (consulta, texto).
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_CROSS_ENCODER,
+        device: Optional[str] = None,
+        max_candidates: int = 50,
+        batch_size: int = 16,
+        max_latency_ms: Optional[float] = 300.0,
+        cache_size: int = 10_000,
+    ) -> None:
+        self.model_name = model_name
+        self.device = device
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.max_latency_ms = max_latency_ms
+        self.cache = LRUCache(cache_size)
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+
+        self.pairs_scored = 0
+        self.cache_hits = 0
+        self.budget_exceeded = 0
+
+    @property
+    def model(self):
+        """
+        Instância do CrossEncoder (carregada no primeiro uso, thread-safe).
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = load_hf_model(CrossEncoder, self.model_name, device=self.device)
+        return self._model
+
+    def warmup(self) -> threading.Thread:
+        """
+        Carrega o cross-encoder em uma thread daemon (ver LazyEncoder.warmup).
+        """
+        with self._lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(
+                    target=self._warmup, name=f"warmup-{self.model_name}", daemon=True
+                )
+                self._warmup_thread.start()
+            return self._warmup_thread
+
+    def _warmup(self) -> None:
+        try:
+            self.model.predict([("aquecimento", "aquecimento do cross-encoder")])
+        except Exception as e:
+            print(f"Aviso: falha ao pré-carregar {self.model_name} ({e}).")
+
+    def rerank(
+        self, query: str, candidates: List[Tuple[int, str]]
+    ) -> List[Tuple[int, Optional[float]]]:
+        """
+        Reordena os candidatos (melhor primeiro).
+
+        Parâmetros
+        ----------
+        query : str
+            Consulta do usuário.
+        candidates : List[Tuple[int, str]]
+            Pares (id, texto) na ordem da busca vetorial/lexical.
+
+        Retorno
+        -------
+        List[Tuple[int, Optional[float]]]
+            Pares (id, score do cross-encoder); candidatos fora do orçamento vêm
+            no final, com score None.
+        """
+        candidates = candidates[: self.max_candidates]
+        deadline = (
+            time.perf_counter() + self.max_latency_ms / 1000
+            if self.max_latency_ms is not None
+            else None
+        )
+
+        scores: Dict[int, float] = {}
+        pending: List[Tuple[int, str, str]] = []
+        for cand_id, text in candidates:
+            key = _pair_key(query, text)
+            cached = self.cache.get(key)
+            record_cache("cross_encoder", cached is not None)
+            if cached is not None:
+                scores[cand_id] = float(cached)
+                self.cache_hits += 1
+            else:
+                pending.append((cand_id, text, key))
+
+        for start in range(0, len(pending), self.batch_size):
+            if deadline is not None and time.perf_counter() >= deadline:
+                self.budget_exceeded += 1
+                break
+            batch = pending[start:start + self.batch_size]
+            predicted = self.model.predict(
+                [(query, text) for _, text, _ in batch], batch_size=self.batch_size
+            )
+            for (cand_id, _, key), score in zip(batch, predicted):
+                scores[cand_id] = float(score)
+                self.cache.set(key, float(score))
+            self.pairs_scored += len(batch)
+
+        scored = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        unscored = [(cand_id, None) for cand_id, _ in candidates if cand_id not in scores]
+        return scored + unscored
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pairs_scored": self.pairs_scored,
+            "cache_hits": self.cache_hits,
+            "budget_exceeded": self.budget_exceeded,
+        }
@@ -0,0 +1,256 @@
+"""
+semantic_cache.py
+Cache semântico de respostas do LLM: perguntas parecidas (similaridade de
+cosseno acima de um limite) com o mesmo contexto recuperado reaproveitam a
+resposta já gerada, sem nova chamada ao Gemini.
+"""
+
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+from index_factory import normalize
+
+
+def _context_hash(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """
+    Cache de respostas indexado por embeddings das perguntas (FAISS, produto interno).
+
+    - Acerto: similaridade >= `threshold`, mesmo contexto e entrada dentro do TTL.
+    - Despejo: LRU quando passa de `max_entries`; entradas vencidas saem na consulta.
+    - Persistência: par `<path>.index` + `<path>.json` (mesmo formato de base/history.*),
+      gravado a cada `save_every` respostas novas ou `save_interval` segundos (e ao
+      sair do processo), não a cada `put`. Os temporários levam o pid, então vários
+      workers podem gravar o mesmo `path` sem corromper os arquivos (o último vence);
+      o .json guarda o sha1 do .index e um par de workers diferentes é descartado.
+    """
+
+    # Vizinhos avaliados por consulta (o mais similar pode ter outro contexto)
+    CANDIDATES = 5
+
+    def __init__(
+        self,
+        encoder,
+        threshold: float = 0.92,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = 24 * 3600,
+        path: Optional[str] = None,
+        save_every: int = 20,
+        save_interval: float = 30.0,
+    ) -> None:
+        self.encoder = encoder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.save_every = save_every
+        self.save_interval = save_interval
+
+        self.index = None
+        self.items: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # uma gravação por vez, na ordem dos snapshots
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            self.load()
+            atexit.register(self.flush)
+
+    # ----------------------------
+    # Consulta / inserção
+    # ----------------------------
+    def get(self, query: str, context: str = "") -> Optional[str]:
+        """
+        Retorna a resposta em cache para uma pergunta semelhante, ou None.
+        """
+        emb = self._embed(query)
+        ctx = _context_hash(context)
+        now = time.time()
+
+        with self._lock:
+            if self.index is None or not self.items:
+                self.misses += 1
+                return None
+
+            scores, ids = self.index.search(emb, min(self.CANDIDATES, len(self.items)))
+            expired = []
+            answer = None
+            for score, item_id in zip(scores[0], ids[0]):
+                item = self.items.get(int(item_id))
+                if item is None:
+                    continue
+                if self._expired(item, now):
+                    expired.append(int(item_id))
+                    continue
+                if score >= self.threshold and item["context"] == ctx:
+                    self.items.move_to_end(int(item_id))
+                    answer = item["answer"]
+                    break
+
+            self._remove(expired)
+
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def put(self, query: str, context: str, answer: str) -> None:
+        """
+        Guarda uma resposta gerada (despeja as menos usadas acima do limite).
+        """
+        emb = self._embed(query)
+
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(emb.shape[1]))
+
+            item_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(emb, np.array([item_id], dtype="int64"))
+            self.items[item_id] = {
+                "query": query,
+                "answer": answer,
+                "context": _context_hash(context),
+                "created": time.time(),
+            }
+
+            overflow = len(self.items) - self.max_entries
+            if overflow > 0:
+                self._remove(list(self.items)[:overflow])
+
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every or (
+                time.monotonic() - self._saved_at >= self.save_interval
+            )
+
+        if self.path and due:
+            self._save()
+
+    def flush(self) -> None:
+        """
+        Grava no disco as respostas ainda não persistidas.
+        """
+        if self.path and self._unsaved:
+            self._save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.index = None
+            self.items.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.path:
+            self._save()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Contadores de acerto/erro e tamanho atual do cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self.items),
+        }
+
+    # ----------------------------
+    # Persistência
+    # ----------------------------
+    def load(self) -> None:
+        """
+        Carrega o cache do disco (se existir); entradas vencidas são descartadas.
+        """
+        index_path, items_path = f"{self.path}.index", f"{self.path}.json"
+        if not (os.path.exists(index_path) and os.path.exists(items_path)):
+            return
+
+        try:
+            with open(index_path, "rb") as f:
+                data = f.read()
+            with open(items_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("index_sha1") != hashlib.sha1(data).hexdigest():
+                raise ValueError(".index e .json gravados por processos diferentes")
+            index = faiss.deserialize_index(np.frombuffer(data, dtype="uint8"))
+        except Exception as e:
+            print(f"Aviso: cache semântico inválido, ignorando ({e}).")
+            return
+
+        with self._lock:
+            self.index = index
+            self.items = OrderedDict((int(i), item) for i, item in saved["items"])
+            self._next_id = saved["next_id"]
+            now = time.time()
+            self._remove([i for i, item in self.items.items() if self._expired(item, now)])
+
+    def _save(self) -> None:
+        """
+        Snapshot em memória sob o lock (rápido) e escrita dos arquivos fora dele,
+        para `get`/`put` de outras threads não esperarem o disco.
+        """
+        with self._save_lock:
+            with self._lock:
+                data = faiss.serialize_index(self.index).tobytes() if self.index is not None else None
+                items = json.dumps(
+                    {
+                        "next_id": self._next_id,
+                        "index_sha1": hashlib.sha1(data).hexdigest() if data else None,
+                        "items": list(self.items.items()),
+                    },
+                    ensure_ascii=False,
+                )
+                self._unsaved = 0
+                self._saved_at = time.monotonic()
+
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                index_path, items_path = f"{self.path}.index", f"{self.path}.json"
+                tmp = f".{os.getpid()}.tmp"
+
+                if data is not None:
+                    with open(index_path + tmp, "wb") as f:
+                        f.write(data)
+                    os.replace(index_path + tmp, index_path)
+                elif os.path.exists(index_path):
+                    os.remove(index_path)
+
+                with open(items_path + tmp, "w", encoding="utf-8") as f:
+                    f.write(items)
+                os.replace(items_path + tmp, items_path)
+            except Exception as e:
+                print(f"Aviso: não foi possível gravar o cache semântico ({e}).")
+
+    # ----------------------------
+    # Internos
+    # ----------------------------
+    def _embed(self, query: str) -> np.ndarray:
+        return normalize(self.encoder.encode([query], convert_to_numpy=True))
+
+    def _expired(self, item: Dict, now: float) -> bool:
+        return self.ttl_seconds is not None and now - item["created"] > self.ttl_seconds
+
+    def _remove(self, item_ids) -> None:
+        if not item_ids:
+            return
+        self.index.remove_ids(np.array(item_ids, dtype="int64"))
+        for item_id in item_ids:
+            self.items.pop(item_id, None)
@@ -0,0 +1,89 @@
+"""
+conftest.py
+Fixtures dos testes: src/ no sys.path e um encoder determinístico no lugar do
+SentenceTransformer (sem download de modelo nem torch).
+"""
+
+import os
+import sys
+import json
+import hashlib
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "py"), os.path.join(ROOT, "app")]
+
+import embeddings  # noqa: E402
+from bm25 import tokenize  # noqa: E402
+
+STUB_MODEL = "stub-bow"
+
+
+class StubEncoder:
+    """
+    Saco de palavras (termos do BM25, com hash em `dim` posições): textos sem
+    termos em comum têm similaridade ~0 e textos iguais têm similaridade 1.
+    """
+
+    def __init__(self, dim: int = 512) -> None:
+        self.dim = dim
+        self.calls = 0
+        self.texts = 0
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        self.calls += 1
+        self.texts += len(texts)
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                out[row, int(hashlib.md5(term.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return out[0] if single else out
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def warmup(self):
+        return None
+
+
+@pytest.fixture
+def encoder():
+    stub = StubEncoder()
+    embeddings._ENCODERS[(STUB_MODEL, None)] = stub
+    yield stub
+    embeddings._ENCODERS.pop((STUB_MODEL, None), None)
+
+
+@pytest.fixture
+def make_store(encoder, tmp_path):
+    """
+    Cria VectorStores com o encoder stub, cache em tmp_path e histórico em memória.
+    """
+    from rag_store import VectorStore
+
+    def make(**kwargs):
+        kwargs.setdefault("cache_dir", str(tmp_path / "faq_cache"))
+        kwargs.setdefault("metric", "cosine")
+        return VectorStore("test-key", embed_model=STUB_MODEL, history_db=None, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def write_faq(tmp_path):
+    """
+    Grava uma lista de (pergunta, resposta) como FAQ JSON e retorna o caminho.
+    """
+
+    def write(items, name="faq.json"):
+        path = tmp_path / name
+        path.write_text(
+            json.dumps([{"q": q, "a": a} for q, a in items], ensure_ascii=False), encoding="utf-8"
+        )
+        return str(path)
+
+    return write
@@ -0,0 +1,160 @@
+"""
+Testes do processamento em lote (app/batch_leads.py) com o LLM simulado.
+"""
+
+import json
+import time
+import asyncio
+
+from batch_leads import RateLimiter, ResultWriter, process_leads
+from chatbot import init_gemini
+
+
+# ----------------------------
+# Checkpoint
+# ----------------------------
+def test_done_ids_drops_torn_last_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    good = [{"lead_id": f"lead_{i}", "lead": {}, "pitch": "p", "resumo": "r"} for i in range(3)]
+    path.write_text(
+        "".join(json.dumps(r) + "\n" for r in good) + '{"lead_id": "lead_3", "lea',
+        encoding="utf-8",
+    )
+
+    writer = ResultWriter(str(path))
+    assert writer.done_ids() == {"lead_0", "lead_1", "lead_2"}
+
+    # O append seguinte começa em uma linha nova e o arquivo volta a ser lido inteiro
+    writer.add({"lead_id": "lead_3", "lead": {}, "pitch": "p", "resumo": "r"})
+    writer.close()
+    assert ResultWriter(str(path)).done_ids() == {"lead_0", "lead_1", "lead_2", "lead_3"}
+
+
+def test_done_ids_completes_missing_final_newline(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text(json.dumps({"lead_id": "lead_0"}), encoding="utf-8")
+
+    writer = ResultWriter(str(path))
+    assert writer.done_ids() == {"lead_0"}
+    writer.add({"lead_id": "lead_1", "lead": {}, "pitch": "p", "resumo": "r"})
+    writer.close()
+    assert ResultWriter(str(path)).done_ids() == {"lead_0", "lead_1"}
+
+
+# ----------------------------
+# Pipeline (LLM simulado)
+# ----------------------------
+def _fake_model(monkeypatch, **env):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_LLM_LATENCY_MS", "0")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_S", "0")
+    for name, value in env.items():
+        monkeypatch.setenv(f"FAKE_LLM_{name}", str(value))
+    return init_gemini(None, "batch-test")
+
+
+def _leads(n):
+    return [
+        {
+            "lead_id": f"lead_{i}",
+            "nome": f"Corretor {i}",
+            "qtd_imoveis": str(i),
+            "localizacao": "Centro",
+            "experiencia": "5 anos",
+        }
+        for i in range(n)
+    ]
+
+
+def _run(leads, writer, model, **kwargs):
+    kwargs.setdefault("concurrency", 4)
+    kwargs.setdefault("rps", 0)
+    kwargs.setdefault("base_delay", 0)
+    return asyncio.run(process_leads(iter(leads), writer, model, **kwargs))
+
+
+def test_process_leads_writes_results_and_resumes(tmp_path, monkeypatch):
+    model = _fake_model(monkeypatch)
+    path = str(tmp_path / "out.jsonl")
+
+    writer = ResultWriter(path, flush_every=3)
+    report = _run(_leads(5)[:3], writer, model)
+    writer.close()
+    assert report["processed"] == 3 and report["failed"] == 0
+    assert report["stages"]["pitch_summary"]["ok"] == 3
+
+    # Retomada: os 3 já gravados são pulados, só os novos chamam o LLM
+    calls = model.stats()["calls"]
+    writer = ResultWriter(path)
+    report = _run(_leads(5), writer, model)
+    writer.close()
+    assert report["skipped"] == 3 and report["processed"] == 2
+    assert model.stats()["calls"] - calls == 2
+
+    rows = [json.loads(line) for line in open(path, encoding="utf-8")]
+    assert sorted(r["lead_id"] for r in rows) == [f"lead_{i}" for i in range(5)]
+    assert all(r["pitch"] and r["resumo"] for r in rows)
+
+
+def test_process_leads_retries_transient_errors(tmp_path, monkeypatch):
+    model = _fake_model(monkeypatch, ERROR_RATE=0.4, SEED=7)
+    writer = ResultWriter(str(tmp_path / "out.jsonl"))
+    report = _run(_leads(10), writer, model, retries=10)
+    writer.close()
+
+    stage = report["stages"]["pitch_summary"]
+    assert report["processed"] == 10 and report["failed"] == 0
+    assert stage["retries"] == model.stats()["errors"] > 0
+
+
+def test_process_leads_counts_exhausted_retries_as_failed(tmp_path, monkeypatch):
+    model = _fake_model(monkeypatch, ERROR_RATE=1.0)
+    writer = ResultWriter(str(tmp_path / "out.jsonl"))
+    report = _run(_leads(2), writer, model, retries=2)
+    writer.close()
+
+    assert report["processed"] == 0 and report["failed"] == 2
+    stage = report["stages"]["pitch_summary"]
+    assert stage["failed"] == 2 and stage["retries"] == 4
+    assert model.stats()["calls"] == 6
+
+
+def test_json_fallback_calls_are_rate_limited_and_counted(tmp_path, monkeypatch):
+    model = _fake_model(monkeypatch)
+    real_text = model._text
+    # Resposta combinada (JSON) inválida: força o fallback de duas chamadas
+    monkeypatch.setattr(
+        model, "_text", lambda prompt, config: "não é json" if config else real_text(prompt, config)
+    )
+    acquired = []
+    real_acquire = RateLimiter.acquire
+
+    async def acquire(self):
+        acquired.append(1)
+        await real_acquire(self)
+
+    monkeypatch.setattr(RateLimiter, "acquire", acquire)
+    writer = ResultWriter(str(tmp_path / "out.jsonl"))
+    report = _run(_leads(3), writer, model)
+    writer.close()
+
+    assert report["processed"] == 3
+    assert {s: v["ok"] for s, v in report["stages"].items()} == {
+        "pitch_summary": 3, "pitch_fallback": 3, "summary_fallback": 3,
+    }
+    assert len(acquired) == model.stats()["calls"] == 9
+
+
+# ----------------------------
+# Controle de vazão
+# ----------------------------
+def test_rate_limiter_spaces_calls_after_burst():
+    async def run():
+        limiter = RateLimiter(rate=50, burst=2)
+        start = time.monotonic()
+        for _ in range(7):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    # 2 na rajada + 5 a 50/s
+    assert 0.09 <= asyncio.run(run()) < 0.5
@@ -0,0 +1,21 @@
+"""
+Testes das métricas do benchmark (src/benchmark.py).
+"""
+
+import numpy as np
+
+import benchmark
+
+
+def test_bench_scale_keeps_distractor_positions_in_mrr(monkeypatch):
+    corpus = np.eye(3, 8, dtype="float32")
+    query = np.array([[1.0, 0.2, 0, 0, 0, 0, 0, 0]], dtype="float32")
+
+    # Dois distratores idênticos à consulta: ficam em 1º e 2º, a resposta certa em 3º
+    monkeypatch.setattr(benchmark, "synthetic_corpus", lambda base, n: np.repeat(query, n, axis=0))
+    [row] = benchmark.bench_scale(
+        corpus, ["a", "b", "c"], query, ["a"], scales=[2], k=3, index_types=["flat"]
+    )
+
+    assert row["recall@3"] == 1.0
+    assert row["mrr@3"] == round(1 / 3, 4)
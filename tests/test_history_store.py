@@ -0,0 +1,82 @@
+"""
+Testes do HistoryStore (src/history_store.py) com o encoder stub do conftest.
+"""
+
+from history_store import HistoryStore
+
+
+def _store(tmp_path, encoder, **kwargs):
+    kwargs.setdefault("index_path", str(tmp_path / "history.faiss"))
+    return HistoryStore(encoder, db_path=str(tmp_path / "leads.db"), legacy_json=None, **kwargs)
+
+
+# ----------------------------
+# Vários processos no mesmo banco
+# ----------------------------
+def test_two_stores_share_one_db(tmp_path, encoder):
+    a = _store(tmp_path, encoder)
+    b = _store(tmp_path, encoder)
+    try:
+        # Nenhuma transação fica aberta: o segundo escritor não recebe "database is locked"
+        a.add("lead-a", "imóvel no centro com dois quartos", session_id="s1")
+        b.add("lead-b", "casa com piscina na praia", session_id="s2")
+        a.add("lead-c", "apartamento perto do metrô", session_id="s1")
+
+        assert a.count() == b.count() == 3
+        assert [h["lead_id"] for h in b.page(session_id="s1")] == ["lead-c", "lead-a"]
+
+        # A busca de um indexa também as linhas gravadas pelo outro
+        b.search("casa praia", top_k=1)
+        assert b.search("apartamento metrô", top_k=1)[0]["lead_id"] == "lead-c"
+    finally:
+        a.close()
+        b.close()
+
+
+# ----------------------------
+# Paginação e indexação sob demanda
+# ----------------------------
+def test_page_is_per_session_newest_first_and_never_encodes(tmp_path, encoder):
+    store = _store(tmp_path, encoder)
+    for i in range(5):
+        store.add(f"s1-{i}", f"resumo {i}", session_id="s1")
+    store.add("s2-0", "outra sessão", session_id="s2")
+
+    assert [h["lead_id"] for h in store.page(0, 2, "s1")] == ["s1-4", "s1-3"]
+    assert [h["lead_id"] for h in store.page(4, 2, "s1")] == ["s1-0"]
+    assert store.count("s1") == 5 and store.count() == 6
+    assert encoder.calls == 0
+    assert store.index is None and not (tmp_path / "history.faiss").exists()
+    store.close()
+
+
+def test_search_indexes_new_rows_in_one_batch_and_saves_every_n(tmp_path, encoder):
+    store = _store(tmp_path, encoder, save_every=4)
+    store.add("lead-0", "imóvel no centro")
+    store.add("lead-1", "casa com piscina")
+
+    assert store.search("piscina", top_k=1)[0]["lead_id"] == "lead-1"
+    assert encoder.calls == 2  # linhas (um lote) + consulta
+    saved = (tmp_path / "history.faiss").stat().st_mtime_ns  # primeira carga grava
+
+    store.add("lead-2", "apartamento perto do metrô")
+    store.search("metrô", top_k=1)
+    assert store.index.ntotal == 3
+    assert (tmp_path / "history.faiss").stat().st_mtime_ns == saved  # 1 vetor < save_every
+    store.close()
+
+
+def test_rows_missing_from_saved_index_are_reindexed_on_load(tmp_path, encoder):
+    store = _store(tmp_path, encoder, save_every=1000)
+    store.add("lead-0", "imóvel no centro")
+    store.search("centro")  # grava o índice com 1 vetor
+    store.add("lead-1", "casa com piscina")
+    store.search("piscina")  # indexado só em memória
+    # Queda antes do close(): o índice em disco ficou sem a segunda linha
+    store._unsaved = 0
+    store.close()
+
+    reopened = _store(tmp_path, encoder)
+    assert reopened.search("piscina", top_k=1)[0]["lead_id"] == "lead-1"
+    assert reopened.index.ntotal == 2
+    reopened.close()
@@ -0,0 +1,108 @@
+"""
+Testes do caminho único de chamada ao LLM (src/llm_call.py) com o LLM simulado.
+"""
+
+import asyncio
+
+import pytest
+
+from chatbot import generate_stream, init_gemini
+from llm_backend import FakeGenerativeModel, FakeResponse
+from llm_call import agenerate_text, generate_text, stream_text
+from LLM_model import LLMModel
+from metrics import CACHE_REQUESTS, LLM_REQUESTS
+from prompt_cache import PromptCache
+
+JSON_CONFIG = {"response_mime_type": "application/json", "response_schema": {"type": "STRING"}}
+
+
+@pytest.fixture
+def model():
+    return FakeGenerativeModel("llm-call-test", latency_ms=0, tokens_per_s=0)
+
+
+class _Failing:
+    """
+    Backend que falha depois de enviar `after` pedaços (ou na chamada, com after=0).
+    """
+
+    model_name = "models/failing"
+
+    def __init__(self, after: int = 0, text: str = "parcial ") -> None:
+        self.after = after
+        self.text = text
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        if not stream:
+            raise RuntimeError("falhou")
+
+        def chunks():
+            for _ in range(self.after):
+                yield FakeResponse(self.text)
+            raise RuntimeError("stream reset")
+
+        return chunks()
+
+
+def test_cache_key_includes_generation_config_in_every_variant(model):
+    cache = PromptCache()
+    plain = generate_text(model, "oi", cache)
+    as_json = generate_text(model, "oi", cache, JSON_CONFIG)
+    assert plain != as_json
+
+    # Streaming usa a mesma chave (antes o stream do chatbot ignorava o config)
+    assert "".join(stream_text(model, "oi", cache, JSON_CONFIG)) == as_json
+    assert "".join(generate_stream(model, "oi", cache, JSON_CONFIG)) == as_json
+    assert asyncio.run(agenerate_text(model, "oi", cache, JSON_CONFIG)) == as_json
+    assert model.stats()["calls"] == 2
+
+
+def test_outcomes_are_recorded_once_per_call(model):
+    before = {
+        outcome: LLM_REQUESTS.value(model=model.model_name, outcome=outcome)
+        for outcome in ("ok", "empty")
+    }
+    hits = CACHE_REQUESTS.value(cache="prompt", result="hit")
+    cache = PromptCache()
+
+    generate_text(model, "uma pergunta", cache)
+    generate_text(model, "uma pergunta", cache)
+    model._text = lambda prompt, config: ""
+    assert generate_text(model, "vazia", cache) == ""
+    assert cache.get(model.model_name, "vazia") is None  # resposta vazia não vai para o cache
+
+    assert LLM_REQUESTS.value(model=model.model_name, outcome="ok") == before["ok"] + 1
+    assert LLM_REQUESTS.value(model=model.model_name, outcome="empty") == before["empty"] + 1
+    assert CACHE_REQUESTS.value(cache="prompt", result="hit") == hits + 1
+
+
+def test_errors_are_counted_and_raised():
+    errors = LLM_REQUESTS.value(model=_Failing.model_name, outcome="error")
+    with pytest.raises(RuntimeError):
+        generate_text(_Failing(), "x")
+    with pytest.raises(RuntimeError):
+        list(stream_text(_Failing(after=2), "x"))
+    assert LLM_REQUESTS.value(model=_Failing.model_name, outcome="error") == errors + 2
+
+
+def test_llm_model_stream_reports_partial_failure_in_status(monkeypatch):
+    monkeypatch.setattr("LLM_model.create_model", lambda *args: _Failing(after=1))
+    llm = LLMModel(None, embed_model="stub-bow", cache=PromptCache())
+
+    status = {}
+    text = "".join(llm.generate_stream("x", status=status))
+    assert text.startswith("parcial [Erro")
+    assert status == {"error": "stream reset", "partial": True}
+    assert llm.cache.get(llm.model_name, "x") is None
+    assert llm.generate("x").startswith("[Erro")
+
+
+def test_llm_model_and_chatbot_share_the_fake_backend(monkeypatch):
+    monkeypatch.setenv("FAKE_LLM_LATENCY_MS", "0")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_S", "0")
+    llm = LLMModel(None, model_name="shared", embed_model="stub-bow", backend="fake")
+    chat = init_gemini(None, "shared", backend="fake")
+
+    assert llm.generate("oi") == chat.generate_content("oi").text
+    assert "".join(llm.generate_stream("oi")) == llm.generate("oi")
+    assert asyncio.run(llm.agenerate("oi")) == llm.generate("oi")
@@ -0,0 +1,62 @@
+"""
+Testes do RAGPipeline (src/rag_pipeline.py) montado por `build_pipeline`, com o
+encoder stub do conftest e o LLM simulado (sem rede).
+"""
+
+import rag_pipeline
+from rag_pipeline import build_pipeline
+from conftest import STUB_MODEL
+
+FAQ = [
+    ("Como funciona a comissão?", "A comissão é paga na assinatura do contrato."),
+    ("Quanto tempo leva para anunciar?", "O anúncio fica no ar em até 24 horas."),
+]
+
+
+def make(write_faq, tmp_path, **kwargs):
+    kwargs.setdefault("rerank", False)  # sem download do cross-encoder
+    return build_pipeline(
+        "test-key",
+        write_faq(FAQ),
+        semantic_cache_path=None,
+        embed_model=STUB_MODEL,
+        cache_dir=str(tmp_path / "faq_cache"),
+        history_db=None,
+        llm_backend="fake",
+        **kwargs,
+    )
+
+
+def test_defaults_are_the_app_configuration(encoder, write_faq, tmp_path):
+    pipeline = make(write_faq, tmp_path)
+    store = pipeline.store
+
+    assert store.score_threshold == rag_pipeline.SCORE_THRESHOLD
+    assert store.direct_threshold == rag_pipeline.DIRECT_ANSWER_SCORE
+    assert store.search_mode == "hybrid" and store.mmap
+    assert pipeline.context_passages == rag_pipeline.CONTEXT_PASSAGES
+    assert pipeline.response_cache.threshold == rag_pipeline.SEMANTIC_CACHE_THRESHOLD
+    assert store.index is not None and len(store.entries) == len(FAQ)
+
+
+def test_stages_can_be_switched_off(encoder, write_faq, tmp_path):
+    pipeline = make(write_faq, tmp_path, semantic_cache=False, direct_threshold=None)
+
+    assert pipeline.response_cache is None and pipeline.store.reranker is None
+    assert pipeline.answer("Como funciona a comissão?")["source"] == "llm"
+
+
+def test_missing_faq_leaves_index_empty(encoder, tmp_path):
+    pipeline = build_pipeline(
+        "test-key", str(tmp_path / "nao_existe.json"), rerank=False, semantic_cache=False,
+        embed_model=STUB_MODEL, history_db=None, llm_backend="fake",
+    )
+    assert pipeline.store.index is None
+
+
+def test_direct_faq_hit_skips_the_llm(encoder, write_faq, tmp_path):
+    pipeline = make(write_faq, tmp_path)
+    result = pipeline.answer("Como funciona a comissão?", session_id="s1")
+
+    assert result["source"] == "faq"
+    assert result["resposta"] == FAQ[0][1]
@@ -0,0 +1,178 @@
+"""
+Testes do VectorStore (src/rag_store.py) com o encoder stub do conftest.
+"""
+
+import sys
+import threading
+
+import faiss
+import pytest
+
+FAQ = [
+    ("Como acesso o painel de leads?", "Entre em app.welhome.com e abra o painel de leads."),
+    ("Como funciona a comissão do corretor?", "A comissão é paga na assinatura do contrato."),
+    ("Como integrar o CRM?", "Use a integração nativa com o CRM em Configurações."),
+    ("Quanto custa o plano?", "O plano custa R$ 99 por mês."),
+]
+
+
+# ----------------------------
+# Busca híbrida
+# ----------------------------
+def test_hybrid_applies_threshold_to_off_topic_query(make_store, write_faq):
+    store = make_store(search_mode="hybrid", score_threshold=0.3, dedupe_answers=True)
+    store.load_faq_from_json(write_faq(FAQ))
+
+    # Só "painel" em comum com o FAQ: o BM25 acha a entrada, mas o score vetorial é baixo
+    query = "Qual a previsão do tempo amanhã no painel?"
+    assert store.lexical.search(query, 5)
+    assert store.rag_answer(query, top_k=3)["matches"] == []
+    assert store.search(query, k=3) == []
+
+
+def test_hybrid_keeps_on_topic_matches(make_store, write_faq):
+    store = make_store(search_mode="hybrid", score_threshold=0.3, dedupe_answers=True)
+    store.load_faq_from_json(write_faq(FAQ))
+
+    hit = store.rag_answer("Como integrar o CRM?", top_k=2)
+    assert hit["question"] == "Como integrar o CRM?"
+    assert all(m["score"] >= 0.3 for m in hit["matches"])
+
+
+def _indexed_ids(store):
+    return set(faiss.vector_to_array(store.index.id_map).tolist())
+
+
+# ----------------------------
+# sync_faq
+# ----------------------------
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_sync_faq_counts_and_removes_vectors(make_store, write_faq, encoder, index_type):
+    path = write_faq(FAQ)
+    store = make_store(index_type=index_type)
+    assert store.sync_faq(path) == {"added": 4, "removed": 0, "unchanged": 0}
+
+    # Uma entrada sai, uma muda de resposta (removida + adicionada) e uma é nova
+    changed = FAQ[1:3] + [
+        (FAQ[3][0], "O plano custa R$ 129 por mês."),
+        ("Tem app?", "Sim, para Android e iOS."),
+    ]
+    write_faq(changed)
+    encoded_before = encoder.texts
+    assert store.sync_faq(path) == {"added": 2, "removed": 2, "unchanged": 2}
+    assert encoder.texts - encoded_before == 2  # só as entradas novas/alteradas
+
+    assert store.index.ntotal == len(store.entries) == 4
+    assert _indexed_ids(store) == set(store.entries)
+    assert all("painel" not in text for text in store.texts)
+    assert store.rag_answer("Quanto custa o plano?")["answer"] == "O plano custa R$ 129 por mês."
+
+
+def test_sync_faq_reports_cache_hit_as_unchanged(make_store, write_faq, encoder):
+    path = write_faq(FAQ)
+    make_store().load_faq_from_json(path)
+
+    encoded_before = encoder.texts
+    assert make_store().sync_faq(path) == {"added": 0, "removed": 0, "unchanged": 4}
+    assert encoder.texts == encoded_before
+
+
+# ----------------------------
+# Cache do índice
+# ----------------------------
+def test_cached_index_is_reused_and_invalidated(make_store, write_faq, encoder):
+    path = write_faq(FAQ)
+    first = make_store()
+    first.load_faq_from_json(path)
+    encoded = encoder.texts
+    assert encoded == len(FAQ)
+
+    # Mesmo conteúdo e configuração: lido do disco, sem recodificar
+    second = make_store()
+    second.load_faq_from_json(path)
+    assert encoder.texts == encoded
+    assert second.texts == first.texts
+    assert second.search(FAQ[2][0], k=1) == first.search(FAQ[2][0], k=1)
+
+    # Conteúdo diferente: nova chave, índice reconstruído
+    write_faq(FAQ + [("Tem app?", "Sim, para Android e iOS.")])
+    encoded = encoder.texts
+    third = make_store()
+    third.load_faq_from_json(path)
+    assert encoder.texts == encoded + len(FAQ) + 1
+    assert len(third.entries) == len(FAQ) + 1
+
+    # Configuração diferente (métrica) também invalida
+    encoded = encoder.texts
+    make_store(metric="l2").load_faq_from_json(path)
+    assert encoder.texts == encoded + len(FAQ) + 1
+
+
+# ----------------------------
+# Deduplicação e limite de score
+# ----------------------------
+def test_dedupe_answers_returns_distinct_answers(make_store, write_faq):
+    answer = "A comissão é paga na assinatura do contrato."
+    faq = FAQ + [
+        ("Quando recebo a comissão?", answer),
+        ("Qual o prazo da comissão?", answer),
+    ]
+    store = make_store(dedupe_answers=True)
+    store.load_faq_from_json(write_faq(faq))
+
+    assert len(store.answers) == len(FAQ)  # resposta repetida guardada uma vez
+    results = store.search("comissão", k=3)
+    assert len(results) == len(set(results))
+    assert results.count(answer) == 1
+
+
+def test_score_threshold_filters_low_scores(make_store, write_faq):
+    store = make_store(score_threshold=0.5, dedupe_answers=True)
+    store.load_faq_from_json(write_faq(FAQ))
+
+    assert store.rag_answer("receita de bolo de chocolate") == store.NO_MATCH
+    hit = store.rag_answer("Como integrar o CRM?", top_k=3)
+    assert hit["question"] == "Como integrar o CRM?"
+    assert hit["matches"] and all(m["score"] >= 0.5 for m in hit["matches"])
+    assert all(score >= 0.5 for _, score in store.search_with_scores("Quanto custa o plano?", k=4))
+
+
+# ----------------------------
+# Concorrência
+# ----------------------------
+def test_search_during_sync_faq_never_sees_swapped_tables(make_store, write_faq):
+    extra = [("Tem app?", "Sim, para Android e iOS."), ("Atendem aos sábados?", "Sim, até o meio-dia.")]
+    path = write_faq(FAQ)
+    store = make_store(dedupe_answers=True)
+    store.load_faq_from_json(path)
+
+    errors = []
+    stop = threading.Event()
+
+    def searcher():
+        while not stop.is_set():
+            try:
+                store.search_with_scores("Como funciona a comissão?", k=3)
+                store.rag_answer("Quanto custa o plano?", top_k=3)
+                store.search_batch(["Tem app?", "Como integrar o CRM?"], k=2)
+            except Exception as e:  # pragma: no cover - só em caso de regressão
+                errors.append(e)
+                return
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    threads = [threading.Thread(target=searcher) for _ in range(4)]
+    try:
+        for t in threads:
+            t.start()
+        for n in range(150):
+            # Alterna entre conjuntos de entradas: ids somem e aparecem a cada sync
+            write_faq(FAQ[n % 2:] + extra[: n % 3])
+            store.sync_faq(path)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        sys.setswitchinterval(interval)
+
+    assert errors == []
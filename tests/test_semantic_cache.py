@@ -0,0 +1,81 @@
+"""
+Testes do SemanticCache (src/semantic_cache.py) com o encoder stub do conftest.
+"""
+
+import os
+import json
+
+from semantic_cache import SemanticCache
+
+
+# ----------------------------
+# Acerto / TTL / LRU
+# ----------------------------
+def test_hit_requires_similar_query_and_same_context(encoder):
+    cache = SemanticCache(encoder, threshold=0.9)
+    cache.put("Como funciona a comissão?", "ctx-a", "Paga na assinatura.")
+
+    assert cache.get("como funciona a comissão", "ctx-a") == "Paga na assinatura."
+    assert cache.get("Como funciona a comissão?", "ctx-b") is None
+    assert cache.get("Quanto custa o plano?", "ctx-a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_expired_entries_are_dropped(encoder):
+    cache = SemanticCache(encoder, ttl_seconds=60)
+    cache.put("Tem app?", "", "Sim.")
+    next(iter(cache.items.values()))["created"] -= 61
+
+    assert cache.get("Tem app?", "") is None
+    assert cache.stats()["size"] == 0
+    assert cache.index.ntotal == 0
+
+
+def test_lru_evicts_least_recently_used(encoder):
+    cache = SemanticCache(encoder, max_entries=2)
+    cache.put("Tem app?", "", "app")
+    cache.put("Quanto custa o plano?", "", "plano")
+    assert cache.get("Tem app?", "") == "app"  # vira a mais recente
+
+    cache.put("Como integrar o CRM?", "", "crm")
+    assert cache.get("Quanto custa o plano?", "") is None
+    assert cache.get("Tem app?", "") == "app"
+    assert cache.get("Como integrar o CRM?", "") == "crm"
+    assert cache.index.ntotal == 2
+
+
+# ----------------------------
+# Persistência
+# ----------------------------
+def test_put_saves_in_batches_and_flush_persists(tmp_path, encoder):
+    path = str(tmp_path / "cache")
+    cache = SemanticCache(encoder, path=path, save_every=3, save_interval=3600)
+
+    cache.put("Tem app?", "", "app")
+    cache.put("Quanto custa o plano?", "", "plano")
+    assert not os.path.exists(path + ".json")  # ainda abaixo de save_every
+
+    cache.put("Como integrar o CRM?", "", "crm")
+    assert len(json.load(open(path + ".json", encoding="utf-8"))["items"]) == 3
+
+    cache.put("Atendem aos sábados?", "", "sábado")
+    cache.flush()
+    assert sorted(os.listdir(tmp_path)) == ["cache.index", "cache.json"]  # sem .tmp sobrando
+
+    reloaded = SemanticCache(encoder, path=path)
+    assert reloaded.stats()["size"] == 4
+    assert reloaded.get("Atendem aos sábados?", "") == "sábado"
+
+
+def test_load_discards_index_and_json_from_different_writers(tmp_path, encoder):
+    path_a, path_b = str(tmp_path / "a"), str(tmp_path / "b")
+    a = SemanticCache(encoder, path=path_a, save_every=1)
+    a.put("Tem app?", "", "app")
+    b = SemanticCache(encoder, path=path_b, save_every=1)
+    b.put("Quanto custa o plano?", "", "plano")
+
+    # .index de um worker com o .json de outro (gravações concorrentes no mesmo path)
+    os.replace(path_b + ".index", path_a + ".index")
+    mixed = SemanticCache(encoder, path=path_a)
+    assert mixed.stats()["size"] == 0
+    assert mixed.get("Tem app?", "") is None